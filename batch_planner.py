@@ -0,0 +1,124 @@
+# 自适应批次规划：根据各题型的实际产出率、单题延迟与输出 token 数决定每批请求多少道题
+import json
+import math
+import os
+import tempfile
+import threading
+
+
+class BatchPlanner:
+    """
+    为每个 (模型, 题型) 维护指数滑动平均的统计量：
+    - yield：合格且不重复的题目数 / 请求题目数
+    - latency：单题平均耗时（秒）
+    - tokens：单题平均输出 token 数
+    plan() 按产出率超额请求以尽量一次补足缺口，同时受批次上限、延迟预算与 token 预算约束；
+    超出约束的缺口由调用方拆成多个并发批次。统计结果保存在 stats_path，跨运行复用。
+    给出 snapshot_path 时进入冻结模式：统计量取自该快照（不存在时由 stats_path 的当前内容生成），
+    运行中不再学习也不写回，批次大小只取决于快照，供响应缓存的记录与回放得到相同的提示词。
+    """
+
+    def __init__(self, stats_path=None, model="", max_batch_size=20,
+                 latency_budget=None, token_budget=None, alpha=0.3, default_yield=0.9, snapshot_path=None):
+        self.stats_path = stats_path
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.latency_budget = latency_budget
+        self.token_budget = token_budget
+        self.alpha = alpha
+        self.default_yield = default_yield
+        self._lock = threading.Lock()
+        self.frozen = snapshot_path is not None
+        if self.frozen and os.path.exists(snapshot_path):
+            self._stats = self._load(snapshot_path)
+        else:
+            self._stats = self._load(stats_path)
+            if self.frozen:
+                self._write(snapshot_path, json.dumps(self._stats, ensure_ascii=False, indent=2))
+
+    @staticmethod
+    def _load(path):
+        if not path or not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def _write(path, data):
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _key(self, question_type):
+        return f"{self.model}|{question_type}"
+
+    def expected_yield(self, question_type):
+        stats = self._stats.get(self._key(question_type))
+        if not stats:
+            return self.default_yield
+        # 产出率过低时仍保留下限，避免一次请求过多
+        return min(max(stats["yield"], 0.2), 1.0)
+
+    def max_size(self, question_type):
+        """在批次上限、延迟预算与 token 预算约束下单批最多请求的题目数。"""
+        limit = self.max_batch_size
+        stats = self._stats.get(self._key(question_type))
+        if stats:
+            if self.latency_budget and stats.get("latency"):
+                limit = min(limit, int(self.latency_budget / stats["latency"]))
+            if self.token_budget and stats.get("tokens"):
+                limit = min(limit, int(self.token_budget / stats["tokens"]))
+        return max(limit, 1)
+
+    def plan(self, question_type, shortfall):
+        """返回下一批请求的题目数；shortfall 为扣除在途批次预期产出后仍缺少的题目数。"""
+        if shortfall <= 0:
+            return 0
+        wanted = math.ceil(shortfall / self.expected_yield(question_type))
+        return max(1, min(wanted, self.max_size(question_type)))
+
+    def record(self, question_type, requested, produced, latency=None, output_tokens=None):
+        """记录一个批次的结果：请求 requested 题，最终得到 produced 道合格且不重复的题目；冻结模式下忽略。"""
+        if requested <= 0 or self.frozen:
+            return
+        with self._lock:
+            key = self._key(question_type)
+            stats = self._stats.get(key)
+            observed = {"yield": min(produced / requested, 1.0)}
+            if latency is not None:
+                observed["latency"] = latency / requested
+            if output_tokens:
+                observed["tokens"] = output_tokens / requested
+            if stats is None:
+                stats = {"batches": 0}
+                stats.update(observed)
+            else:
+                for name, value in observed.items():
+                    previous = stats.get(name)
+                    stats[name] = value if previous is None else previous + self.alpha * (value - previous)
+            stats["batches"] += 1
+            self._stats[key] = stats
+
+    def summary(self, question_type):
+        stats = self._stats.get(self._key(question_type))
+        if not stats:
+            return f"{question_type}：暂无统计"
+        parts = [f"产出率{stats['yield']:.0%}"]
+        if stats.get("latency"):
+            parts.append(f"单题{stats['latency']:.1f}秒")
+        if stats.get("tokens"):
+            parts.append(f"单题{stats['tokens']:.0f} tokens")
+        return f"{question_type}：" + "，".join(parts)
+
+    def save(self):
+        if not self.stats_path or self.frozen:
+            return
+        with self._lock:
+            data = json.dumps(self._stats, ensure_ascii=False, indent=2)
+        self._write(self.stats_path, data)
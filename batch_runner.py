@@ -0,0 +1,224 @@
+# 批量组卷：按清单为多个技术方向各生成若干份试卷，API 请求共享一个并发预算，文档渲染分发到进程池
+import json
+import math
+import multiprocessing
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+from conf.config import (
+    DEFAULT_QUESTION_TYPES, BATCH_PARALLEL_DIRECTIONS, BATCH_RENDER_WORKERS, VARIANT_FRESH_RATIO,
+    DOCX_SPOOL_SECTIONS, USE_QUESTION_BANK, QUESTION_BANK_PATH,
+)
+from document_utils import render_exam_paper
+from exam_generator import EnhancedInterviewGenerator, create_batch_planner
+from knowledge_clusters import iter_concept_blocks
+from question_bank import QuestionBank
+from telemetry import get_telemetry
+
+
+def load_manifest(path):
+    """
+    读取 JSON 清单，格式：
+    {
+        "output_dir": "papers",
+        "question_types": [["单选题", 30], ["问答题", 10]],
+        "papers": [
+            {"tech_direction": "JAVA", "variants": 3},
+            {"tech_direction": "Python-Django", "question_types": [["单选题", 20]]}
+        ]
+    }
+    顶层 question_types 为默认题型配比（缺省为 DEFAULT_QUESTION_TYPES），可在单个条目中覆盖；
+    variants 缺省为 1。每个任务的 name 用于输出文件名与检查点：技术方向在清单中出现多次时
+    依次加上 _1、_2 等后缀，避免同名试卷互相覆盖、检查点日志互相穿插。返回 (任务列表, 输出目录)。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    default_types = manifest.get("question_types") or DEFAULT_QUESTION_TYPES
+    entries = manifest.get("papers", [])
+    for entry in entries:
+        if not entry.get("tech_direction"):
+            raise ValueError(f"清单条目缺少 tech_direction：{entry}")
+    counts = Counter(entry["tech_direction"] for entry in entries)
+    seen = Counter()
+    jobs = []
+    for entry in entries:
+        tech_direction = entry["tech_direction"]
+        seen[tech_direction] += 1
+        jobs.append({
+            "tech_direction": tech_direction,
+            "name": f"{tech_direction}_{seen[tech_direction]}" if counts[tech_direction] > 1 else tech_direction,
+            "question_types": [tuple(item) for item in entry.get("question_types") or default_types],
+            "variants": max(int(entry.get("variants", 1)), 1),
+        })
+    return jobs, manifest.get("output_dir", ".")
+
+
+def _fresh_count(total, variants):
+    return min(total, math.ceil(total * VARIANT_FRESH_RATIO)) if variants > 1 else 0
+
+
+def pool_question_types(question_types, variants):
+    """同一方向 variants 份试卷共用的题目池：第一份需要全部题目，之后每份只需补充替换的题目。"""
+    return [(q_type, total + (variants - 1) * _fresh_count(total, variants)) for q_type, total in question_types]
+
+
+def paper_question_types(pool_types, variants):
+    """pool_question_types 的逆运算：由题目池配比（如续跑时沿用的检查点配比）推出每份试卷的题型配比。"""
+    paper_types = []
+    for q_type, pool_total in pool_types:
+        total = pool_total
+        while total > 0 and total + (variants - 1) * _fresh_count(total, variants) > pool_total:
+            total -= 1
+        paper_types.append((q_type, total))
+    return paper_types
+
+
+def build_variant(generator, question_types, variants, index):
+    """
+    从生成器的题目池中取出第 index 份试卷：每个题型按滑动窗口取题，相邻两份试卷只替换
+    VARIANT_FRESH_RATIO 比例的题目；题号按题型顺序重新编排。返回 (题目, 答案表, 知识点总结)。
+    知识点总结为本卷题目涉及的知识点块列表，【相关题目】改用本卷题号；题目与文本均可 pickle 后交给渲染进程。
+    """
+    generated, answer_sheet, number_map = {}, [], {}
+    number = 0
+    for q_type, total in question_types:
+        pool = generator.generated_questions.get(q_type, [])
+        start = min(index * _fresh_count(total, variants), max(len(pool) - total, 0))
+        generated[q_type] = []
+        for q in pool[start:start + total]:
+            number += 1
+            number_map[q.number] = number
+            q_variant = q.renumbered(number)
+            generated[q_type].append(q_variant)
+            answer_sheet.append(q_variant)
+    return generated, answer_sheet, list(iter_concept_blocks(generator.concept_summaries, number_map))
+
+
+def _render_variant(tech_direction, generated, answer_sheet, knowledge_points, filename):
+    """进程池中执行：渲染并保存一份试卷，返回 (文件名, 耗时秒)。"""
+    start = time.perf_counter()
+    render_exam_paper(tech_direction, generated, answer_sheet, knowledge_points, filename, spool=DOCX_SPOOL_SECTIONS)
+    return filename, time.perf_counter() - start
+
+
+class BatchRunner:
+    """
+    所有技术方向在同一进程内并发生成，共享各后端的全局限流器、连接池，以及题库与批次规划器，
+    同一方向的多份试卷共用一个题目池，只为被替换的题目调用 API；渲染交给进程池并行执行。
+    """
+
+    def __init__(self, output_dir=".", resume=False):
+        self.output_dir = output_dir
+        self.resume = resume
+        self.question_bank = QuestionBank(QUESTION_BANK_PATH) if USE_QUESTION_BANK else None
+        self.batch_planner = create_batch_planner()
+
+    def _filename(self, job_name, index, variants):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+        name = re.sub(r'[\\/:*?"<>|\s]+', '_', job_name)
+        suffix = f"_v{index + 1}" if variants > 1 else ""
+        return os.path.join(self.output_dir, f"{name}_Interview_{timestamp}{suffix}.docx")
+
+    def _run_direction(self, job, render_pool):
+        tech_direction, question_types, variants = job["tech_direction"], job["question_types"], job["variants"]
+        name = job.get("name", tech_direction)
+        entries = []
+        start = time.monotonic()
+        try:
+            generator = EnhancedInterviewGenerator(
+                tech_direction, question_bank=self.question_bank, batch_planner=self.batch_planner,
+                show_progress=False, paper_name=name,
+            )
+            pool_types = pool_question_types(question_types, variants)
+            print(f"[{name}] 开始生成题目池：" + "，".join(f"{t}{n}题" for t, n in pool_types))
+            used_types, _ = generator.collect_questions(pool_types, resume=self.resume)
+            if used_types != pool_types:
+                # 续跑时沿用了检查点中的配比，按实际的题目池配比切分各份试卷
+                question_types = paper_question_types(used_types, variants)
+            generation_seconds = time.monotonic() - start
+        except Exception as e:
+            print(f"[{name}] 生成失败：{e}")
+            return [{"tech_direction": tech_direction, "name": name, "status": "error", "error": repr(e),
+                     "generation_seconds": round(time.monotonic() - start, 2)}]
+        # 每份试卷单独处理渲染失败：已渲染或已排队的其他试卷照常登记并写入报告
+        futures = []
+        for index in range(variants):
+            try:
+                generated, answer_sheet, knowledge_points = build_variant(generator, question_types, variants, index)
+                filename = self._filename(name, index, variants)
+                future = render_pool.submit(
+                    _render_variant, tech_direction, generated, answer_sheet, knowledge_points, filename
+                )
+            except Exception as e:
+                future, answer_sheet, knowledge_points = Future(), None, None
+                future.set_exception(e)
+            futures.append((index, answer_sheet, knowledge_points, future))
+        for index, answer_sheet, knowledge_points, future in futures:
+            try:
+                filename, render_seconds = future.result()
+                generator.finish_paper(filename, answer_sheet)
+            except Exception as e:
+                print(f"[{name}] 第{index + 1}份试卷出卷失败：{e}")
+                entries.append({"tech_direction": tech_direction, "name": name, "variant": index + 1,
+                                "status": "error", "error": repr(e),
+                                "generation_seconds": round(generation_seconds, 2)})
+                continue
+            entries.append({
+                "tech_direction": tech_direction, "name": name, "variant": index + 1, "status": "ok",
+                "filename": filename,
+                "questions": len(answer_sheet),
+                "expected": sum(total for _, total in question_types),
+                "knowledge_blocks": len(knowledge_points),
+                "generation_seconds": round(generation_seconds, 2),
+                "render_seconds": round(render_seconds, 2),
+                "pool_sources": dict(generator.question_sources),
+            })
+            print(f"[{name}] 第{index + 1}份试卷已保存：{filename}，共{len(answer_sheet)}题")
+        # 有试卷失败时保留未完成的检查点，--resume 可复用题目池重新出卷
+        if generator.checkpoint is not None and all(entry["status"] == "ok" for entry in entries):
+            generator.checkpoint.finish(entries[0]["filename"] if entries else "")
+        return entries
+
+    def run(self, jobs):
+        """执行全部任务，返回逐份试卷的报告条目列表，并把报告写入输出目录。"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        start = time.monotonic()
+        # 生成线程仍在运行时创建子进程，使用 spawn 避免 fork 继承已持有的锁
+        render_pool = ProcessPoolExecutor(
+            max_workers=BATCH_RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+        with render_pool, ThreadPoolExecutor(max_workers=BATCH_PARALLEL_DIRECTIONS) as direction_pool:
+            futures = [direction_pool.submit(self._run_direction, job, render_pool) for job in jobs]
+            report = [entry for future in futures for entry in future.result()]
+        self.batch_planner.save()
+        elapsed = time.monotonic() - start
+        path = os.path.join(self.output_dir, f"batch_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"elapsed_seconds": round(elapsed, 2), "papers": report}, f, ensure_ascii=False, indent=2)
+        self._print_report(report, elapsed, path)
+        return report
+
+    @staticmethod
+    def _print_report(report, elapsed, path):
+        print("\n========== 批量组卷报告 ==========")
+        for entry in report:
+            if entry["status"] != "ok":
+                variant = f" 第{entry['variant']}份" if "variant" in entry else ""
+                print(f"{entry['name']}{variant}：失败（{entry['error']}）")
+                continue
+            sources = entry["pool_sources"]
+            print(f"{entry['name']} 第{entry['variant']}份：{entry['questions']}/{entry['expected']}题，"
+                  f"知识点{entry['knowledge_blocks']}条，生成{entry['generation_seconds']}秒，渲染{entry['render_seconds']}秒，"
+                  f"题目池来源 API {sources['api']} / 题库 {sources['bank']} / 检查点 {sources['restored']}")
+        ok = sum(1 for entry in report if entry["status"] == "ok")
+        print(f"共{len(report)}份试卷，成功{ok}份，总耗时{elapsed:.1f}秒；报告已写入 {path}")
+        print(f"Token 用量：{get_telemetry().token_summary()}")
+
+
+def run_manifest(path, resume=False):
+    jobs, output_dir = load_manifest(path)
+    return BatchRunner(output_dir, resume=resume).run(jobs)
@@ -0,0 +1,152 @@
+# 端到端基准：在本地模拟服务器上驱动真实的 EnhancedInterviewGenerator，统计吞吐、调用效率、阶段耗时与峰值内存；
+# --check-replay 先记录一次运行的响应缓存，再以回放模式重跑，检查回放不发请求且试卷内容一致
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_server import MockChatServer, MockConfig
+
+DEFAULT_MIX = [("单选题", 30), ("多选题", 30), ("填空题", 10), ("判断题", 10), ("问答题", 10)]
+
+
+def parse_mix(text):
+    mix = []
+    for item in text.split(","):
+        q_type, count = item.split(":")
+        mix.append((q_type.strip(), int(count)))
+    return mix
+
+
+def run(args):
+    config = MockConfig(
+        latency_mean=args.latency, latency_sigma=args.latency_sigma, token_rate=args.token_rate,
+        malformed_rate=args.malformed_rate, duplicate_rate=args.duplicate_rate,
+        rate_limit_rate=args.rate_limit_rate, error_rate=args.error_rate, seed=args.seed,
+    )
+    workdir = tempfile.mkdtemp(prefix="exam_bench_")
+    with MockChatServer(config) as server:
+        # 必须在导入生成器之前改写配置：各模块在导入时读取 conf.config
+        import conf.config as settings
+        settings.DEEPSEEK_BASE_URL = server.base_url
+        settings.CACHE_MODE = args.cache_mode
+        settings.CACHE_DIR = args.cache_dir or os.path.join(workdir, "responses")
+        settings.USE_QUESTION_BANK = args.use_bank
+        settings.QUESTION_BANK_PATH = args.bank_path or os.path.join(workdir, "question_bank.db")
+        settings.BATCH_STATS_PATH = os.path.join(workdir, "batch_stats.json")
+        settings.TELEMETRY_DIR = os.path.join(workdir, "telemetry")
+        settings.CHECKPOINT_DIR = os.path.join(workdir, "checkpoints")
+        settings.SUMMARY_CACHE_DIR = os.path.join(workdir, "summaries")
+        settings.STREAM_COMPLETIONS = args.stream
+        settings.RETRY_BASE_DELAY = 0.05
+        from exam_generator import EnhancedInterviewGenerator
+
+        os.chdir(workdir)
+        tracemalloc.start()
+        start = time.perf_counter()
+        generator = EnhancedInterviewGenerator(tech_direction=args.direction)
+        generator.generate_exam_paper(args.mix)
+        elapsed = time.perf_counter() - start
+        _, peak_traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    telemetry = generator.telemetry
+    questions = generator.question_count
+    api_calls = telemetry.counter_total("exam_api_calls_total")
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print("\n========== 端到端基准结果 ==========")
+    print(f"模拟服务器统计：{server.stats}")
+    print(f"题目数：{questions}，总耗时：{elapsed:.2f}秒，吞吐：{questions / elapsed:.2f} 题/秒")
+    print(f"API 调用：{api_calls:.0f} 次（失败 {telemetry.counter_total('exam_api_calls_total', outcome='error'):.0f} 次），"
+          f"每道有效题目 {api_calls / max(questions, 1):.3f} 次调用")
+    summary = generator.summary_stats
+    print(f"知识点总结：{questions} 题归为 {summary['concepts']} 个知识点，"
+          f"新请求 {summary['requested']} 个，复用 {summary['cached']} 个")
+    print(f"Token 用量：{telemetry.token_summary()}")
+    print(f"峰值内存：tracemalloc {peak_traced / 1024 / 1024:.1f} MB，进程 RSS {max_rss_kb / 1024:.1f} MB")
+    print("阶段耗时：")
+    for stage, (count, total) in sorted(telemetry.stage_totals().items(), key=lambda item: -item[1][1]):
+        print(f"  {stage:<28}{count:>6} 次{total:>10.3f} 秒")
+    print(f"输出目录：{workdir}")
+    if args.result:
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump({
+                "requests": server.stats["requests"],
+                "questions": [q.question for q in generator.answer_sheet],
+                "summaries": [entry["text"] for entry in generator.concept_summaries],
+            }, f, ensure_ascii=False)
+
+
+def check_replay():
+    """
+    以相同参数先 on 模式记录、再 replay 模式重跑。两次共用同一个响应缓存目录和同一个启用的题库
+    （与默认配置一致，记录时写入的题目在回放时已在题库中），其余状态各自独立。
+    """
+    argv = [arg for arg in sys.argv[1:] if arg not in ("--check-replay", "--use-bank")]
+    workdir = tempfile.mkdtemp(prefix="exam_replay_")
+    cache_dir = os.path.join(workdir, "responses")
+    bank_path = os.path.join(workdir, "question_bank.db")
+    results = {}
+    for mode in ("on", "replay"):
+        result_path = os.path.join(workdir, f"{mode}.json")
+        print(f"\n========== 响应缓存 {mode} 模式 ==========", flush=True)
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), *argv, "--cache-mode", mode,
+                                    "--cache-dir", cache_dir, "--use-bank", "--bank-path", bank_path,
+                                    "--result", result_path])
+        if completed.returncode != 0:
+            print(f"回放检查失败：{mode} 模式运行退出码 {completed.returncode}")
+            return 1
+        with open(result_path, encoding="utf-8") as f:
+            results[mode] = json.load(f)
+    recorded, replayed = results["on"], results["replay"]
+    problems = []
+    if replayed["requests"]:
+        problems.append(f"回放时仍向服务器发出 {replayed['requests']} 次请求")
+    if replayed["questions"] != recorded["questions"]:
+        problems.append("回放生成的题目与记录时不一致")
+    if replayed["summaries"] != recorded["summaries"]:
+        problems.append("回放生成的知识点总结与记录时不一致")
+    print("\n========== 回放检查 ==========")
+    if problems:
+        print("回放检查失败：" + "；".join(problems))
+        return 1
+    print(f"回放检查通过：记录 {recorded['requests']} 次请求，回放 0 次请求，"
+          f"{len(recorded['questions'])} 道题目与 {len(recorded['summaries'])} 个知识点总结完全一致")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线端到端基准")
+    parser.add_argument("--direction", default="JAVA")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="题型配比，例如 单选题:30,问答题:10")
+    parser.add_argument("--latency", type=float, default=0.3, help="模拟首 token 前平均等待（秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--token-rate", type=float, default=400.0, help="模拟输出速度（token/秒）")
+    parser.add_argument("--malformed-rate", type=float, default=0.05)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-stream", dest="stream", action="store_false", help="使用非流式请求")
+    parser.add_argument("--use-bank", action="store_true", help="启用本地题库（默认关闭，保证每次都走 API）")
+    parser.add_argument("--bank-path", help="题库文件路径，默认为本次运行的临时目录")
+    parser.add_argument("--cache-mode", choices=("off", "on", "replay"), default="off", help="响应缓存模式")
+    parser.add_argument("--cache-dir", help="响应缓存目录，默认为本次运行的临时目录")
+    parser.add_argument("--result", help="把题目与知识点总结文本写入该 JSON 文件，供回放检查比较")
+    parser.add_argument("--check-replay", action="store_true", help="先记录再回放，检查回放结果与记录一致")
+    args = parser.parse_args()
+    if args.check_replay:
+        sys.exit(check_replay())
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# 文档渲染微基准：分别测量题目、答案解析、知识点总结的写入与保存在不同题量下的耗时和内存峰值
+import argparse
+import io
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+
+from document_utils import (
+    setup_document_style, add_answer_section, add_knowledge_summary_section_template, add_question_sections,
+)
+from docx_bulk import save_document
+from question_model import Question
+
+_TYPES = ("单选题", "多选题", "填空题", "判断题", "问答题")
+_WORDS = "线程池 锁 内存模型 垃圾回收 类加载 反射 注解 泛型 集合 事务 索引 缓存 队列 调度 序列化 代理".split()
+
+
+def make_fixture(size, seed=0):
+    """构造 size 道题目及对应的答案表与逐块的知识点总结，结构与真实生成结果一致。"""
+    rng = random.Random(seed)
+    generated = {q_type: [] for q_type in _TYPES}
+    answer_sheet = []
+    blocks = []
+    for number in range(1, size + 1):
+        q_type = _TYPES[(number - 1) * len(_TYPES) // size]
+        stem = "、".join(rng.sample(_WORDS, 3))
+        q = Question(
+            number, q_type, f"关于{stem}的第{number}个问题？\nA. 选项一\nB. 选项二\nC. 选项三\nD. 选项四",
+            short_answer="B", detailed_analysis=f"{stem}的详细解析。" * 8, difficulty=rng.randint(1, 5),
+        )
+        generated[q_type].append(q)
+        answer_sheet.append(q)
+        blocks.append(f"【知识点名称】：{stem}\n【原理】：{stem}的原理说明。\n"
+                      f"【实际应用】：{stem}的应用场景。\n【注意事项】：{stem}的注意事项。\n====\n")
+    return generated, answer_sheet, blocks
+
+
+def _new_document():
+    doc = Document()
+    setup_document_style(doc)
+    return doc
+
+
+def run_stages(size, trace_memory, spool):
+    """
+    返回 [(阶段, 耗时秒, 进程 RSS 峰值增长字节, tracemalloc 峰值字节或 None)]。
+    lxml 的节点由 libxml2 在 C 堆上分配，tracemalloc 看不到，因此同时报告 RSS 峰值的增长。
+    """
+    generated, answer_sheet, summary_blocks = make_fixture(size)
+    doc = _new_document()
+    stages = [
+        ("knowledge_summary", lambda: add_knowledge_summary_section_template(doc, summary_blocks, spool=spool)),
+        ("questions", lambda: add_question_sections(doc, generated, spool=spool)),
+        ("answers", lambda: add_answer_section(doc, answer_sheet, spool=spool)),
+        ("save", lambda: save_document(doc, io.BytesIO())),
+    ]
+    results = []
+    for name, func in stages:
+        if trace_memory:
+            tracemalloc.start()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) * 1024
+        results.append((name, elapsed, rss_growth, peak))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文档渲染微基准")
+    parser.add_argument("--sizes", default="100,1000,10000", help="逗号分隔的题量")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="额外用 tracemalloc 跑一遍统计各阶段内存峰值（会显著拖慢耗时，因此与计时分开）")
+    parser.add_argument("--no-spool", dest="spool", action="store_false", help="正文直接留在内存中的文档树里")
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        timings = run_stages(size, trace_memory=False, spool=args.spool)
+        traced = run_stages(size, trace_memory=True, spool=args.spool) if args.trace_memory else timings
+        total = sum(result[1] for result in timings)
+        print(f"\n===== {size} 道题，合计 {total:.3f} 秒 =====")
+        for (name, elapsed, rss_growth, _), (*_, peak) in zip(timings, traced):
+            line = (f"  {name:<20}{elapsed:>9.3f} 秒{elapsed / size * 1000:>9.3f} 毫秒/题"
+                    f"  RSS +{rss_growth / 1024 / 1024:.1f} MB")
+            if peak is not None:
+                line += f"  tracemalloc {peak / 1024 / 1024:.1f} MB"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
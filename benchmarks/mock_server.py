@@ -0,0 +1,264 @@
+# 本地模拟的 OpenAI 兼容 chat-completions 服务器，用于离线压测与故障注入
+import argparse
+import collections
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_VOCAB = ("线程池 锁 内存模型 垃圾回收 类加载 反射 注解 泛型 集合 映射 接口 抽象类 继承 多态 封装 异常 "
+          "事务 索引 缓存 队列 调度 网络 协议 序列化 代理 工厂 单例 观察者 策略 volatile synchronized "
+          "CAS AQS JVM 堆 栈 方法区 字节码 JIT 逃逸分析 分代 并发 死锁 乐观锁 悲观锁 MVCC 分库分表").split()
+_QUESTION_TYPES = ("单选题", "多选题", "填空题", "判断题", "问答题")
+
+
+class MockConfig:
+    """
+    故障与性能参数：
+    - latency_mean / latency_sigma：首 token 前的等待时间，服从对数正态分布（秒）
+    - token_rate：流式输出速度（token/秒），非流式请求按同样速度计算总耗时；0 表示不限速
+    - malformed_rate：每道题被写成非法 JSON 的概率
+    - duplicate_rate：每道题直接复用此前已返回题目的概率
+    - rate_limit_rate：请求直接返回 429（带 Retry-After）的概率
+    - error_rate：请求返回 503 的概率
+    """
+
+    def __init__(self, latency_mean=0.2, latency_sigma=0.5, token_rate=0.0, malformed_rate=0.0,
+                 duplicate_rate=0.0, rate_limit_rate=0.0, error_rate=0.0, retry_after=0.1, seed=None):
+        self.latency_mean = latency_mean
+        self.latency_sigma = latency_sigma
+        self.token_rate = token_rate
+        self.malformed_rate = malformed_rate
+        self.duplicate_rate = duplicate_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.seed = seed
+
+
+class MockChatServer:
+    """在后台线程中运行的模拟服务器；base_url 可直接传给 DeepSeekClient / OpenAI。"""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or MockConfig()
+        self.random = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+        self.served = []
+        self.recent_prompts = collections.deque(maxlen=256)
+        self.counter = 0
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0, "malformed": 0, "duplicates": 0}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    # ---------- 内容生成 ----------
+
+    def _roll(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+    def _latency(self):
+        with self.lock:
+            return self.random.lognormvariate(0, self.config.latency_sigma) * self.config.latency_mean
+
+    def _new_stem(self):
+        with self.lock:
+            self.counter += 1
+            words = self.random.sample(_VOCAB, 4)
+            return f"关于{words[0]}与{words[1]}在{words[2]}场景下结合{words[3]}的第{self.counter}个问题"
+
+    def _question(self, q_type):
+        if self.served and self._roll(self.config.duplicate_rate):
+            with self.lock:
+                self.stats["duplicates"] += 1
+                candidates = [q for q in self.served if q[0] == q_type] or self.served
+                return dict(self.random.choice(candidates)[1])
+        stem = self._new_stem()
+        if q_type == "单选题":
+            q = {"question": f"{stem}？\nA. 选项一\nB. 选项二\nC. 选项三\nD. 选项四", "short_answer": "B"}
+        elif q_type == "多选题":
+            q = {"question": f"{stem}？\nA. 选项一\nB. 选项二\nC. 选项三\nD. 选项四\nE. 选项五", "short_answer": "ACE"}
+        elif q_type == "填空题":
+            q = {"question": f"{stem}中，___________负责什么？", "short_answer": "具体内容"}
+        elif q_type == "判断题":
+            q = {"question": f"{stem}的说法是否成立？", "short_answer": "正确"}
+        else:
+            q = {"question": f"请详细解释{stem}", "short_answer": "简明答案"}
+        q.update({
+            "detailed_analysis": "这是一段模拟的技术解析。" * 10,
+            "keywords": re.findall(r'关于(.+?)与', stem)[:1] or ["并发"],
+            "difficulty": str(self.random.randint(1, 5)),
+        })
+        with self.lock:
+            self.served.append((q_type, q))
+        return q
+
+    def _questions_payload(self, q_type, num):
+        parts = []
+        for _ in range(num):
+            text = json.dumps(self._question(q_type), ensure_ascii=False)
+            if self._roll(self.config.malformed_rate):
+                with self.lock:
+                    self.stats["malformed"] += 1
+                text = text.replace('", "', '" "', 1)
+            parts.append(text)
+        return '```json\n{"questions": [' + ", ".join(parts) + "]}\n```"
+
+    def _prefix_cache_hit(self, text):
+        """模拟服务端上下文缓存：与近期请求的最长公共前缀按 64 token 为单位计为命中（约 2 字符/token）。"""
+        with self.lock:
+            common = max((len(os.path.commonprefix([text, seen])) for seen in self.recent_prompts), default=0)
+            self.recent_prompts.append(text)
+        return common // 2 // 64 * 64
+
+    @staticmethod
+    def _summary_payload(prompt):
+        blocks = []
+        for line in prompt.split("知识点如下")[-1].splitlines():
+            if re.match(r'^\d+\.', line.strip()):
+                name = re.sub(r'^\d+\.\s*', '', line.strip())[:20]
+                blocks.append(f"【知识点名称】：{name}\n【原理】：模拟原理说明。\n【实际应用】：模拟应用场景。\n"
+                              f"【注意事项】：模拟注意事项。\n====")
+        return "\n".join(blocks)
+
+    def _content_for(self, prompt):
+        if "知识点如下" in prompt:
+            return self._summary_payload(prompt)
+        match = re.search(r'生成(\d+)道', prompt)
+        num = int(match.group(1)) if match else 10
+        q_type = next((t for t in _QUESTION_TYPES if t in prompt), "问答题")
+        return self._questions_payload(q_type, num)
+
+    # ---------- HTTP 处理 ----------
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_chunk(self, data):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with server.lock:
+                    server.stats["requests"] += 1
+                if server._roll(server.config.rate_limit_rate):
+                    with server.lock:
+                        server.stats["rate_limited"] += 1
+                    self._send_json(429, {"error": {"message": "rate limited"}},
+                                    {"Retry-After": str(server.config.retry_after)})
+                    return
+                if server._roll(server.config.error_rate):
+                    with server.lock:
+                        server.stats["errors"] += 1
+                    self._send_json(503, {"error": {"message": "service unavailable"}})
+                    return
+                prompt = body.get("messages", [{}])[-1].get("content", "")
+                model = body.get("model", "mock")
+                content = server._content_for(prompt)
+                prompt_text = "\n".join(m.get("content", "") for m in body.get("messages", []))
+                prompt_tokens = len(prompt_text) // 2
+                completion_tokens = max(len(content) // 2, 1)
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                         "total_tokens": prompt_tokens + completion_tokens,
+                         "prompt_cache_hit_tokens": server._prefix_cache_hit(prompt_text)}
+                time.sleep(server._latency())
+                if body.get("stream"):
+                    self._stream(model, content, usage)
+                    return
+                if server.config.token_rate:
+                    time.sleep(completion_tokens / server.config.token_rate)
+                self._send_json(200, {
+                    "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": usage,
+                })
+
+            def _stream(self, model, content, usage):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                step = 16  # 每个分片约 8 个 token
+                for i in range(0, len(content), step):
+                    piece = content[i:i + step]
+                    chunk = {"id": "mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": model,
+                             "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                    self._write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    if server.config.token_rate:
+                        time.sleep(len(piece) / 2 / server.config.token_rate)
+                final = {"id": "mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [], "usage": usage}
+                self._write_chunk(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+                self._write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动本地模拟 chat-completions 服务器")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="首 token 前平均等待（秒）")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="输出速度（token/秒），0 表示不限速")
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    config = MockConfig(latency_mean=args.latency, token_rate=args.token_rate,
+                        malformed_rate=args.malformed_rate, duplicate_rate=args.duplicate_rate,
+                        rate_limit_rate=args.rate_limit_rate, error_rate=args.error_rate)
+    server = MockChatServer(config, port=args.port).start()
+    print(f"模拟服务器已启动：{server.base_url}（Ctrl-C 退出）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# 生成过程检查点：把每道采纳的题目与每个知识点总结追加写入 JSONL 日志，中断后可据此续跑
+import json
+import os
+import re
+import threading
+import time
+
+
+class CheckpointJournal:
+    """
+    每个技术方向一个日志文件（批量组卷时同一方向的多个清单条目以 name 区分），逐行记录：
+    - start：本次运行的技术方向与题型配比；
+    - question：一道已采纳的题目（题库抽取或新生成），按采纳顺序写入；
+    - summary：一个已完成的知识点（概念）总结（概念 key 与总结文本）；
+    - done：试卷已保存。
+    题号由题型顺序与采纳顺序唯一确定，因此续跑时按原顺序恢复题目即可保持编号不变，
+    题目按题号重新归类后得到的概念 key 也与中断前一致。
+    每行写入后立即 flush，进程崩溃最多丢失正在写的那一行，读取时会跳过不完整的行。
+    """
+
+    def __init__(self, directory, tech_direction, name=None):
+        name = re.sub(r'[^\w.-]+', '_', name or tech_direction)
+        self.path = os.path.join(directory, f"{name}.jsonl")
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self):
+        """
+        读取上次运行的日志；日志不存在或上次已完成时返回 None，
+        否则返回 {"question_types", "questions": {题型: [题目]}, "summaries": {概念 key: 文本}}。
+        """
+        if not os.path.exists(self.path):
+            return None
+        state = {"question_types": None, "questions": {}, "summaries": {}}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                event = record.get("event")
+                if event == "start":
+                    state["question_types"] = [tuple(item) for item in record["question_types"]]
+                elif event == "question":
+                    state["questions"].setdefault(record["type"], []).append(record["question"])
+                elif event == "summary" and "concept" in record:
+                    state["summaries"][record["concept"]] = record["text"]
+                elif event == "done":
+                    return None
+        return state
+
+    def open(self, tech_direction=None, question_types=None, resume=False):
+        """开始写日志；resume=False 时清空旧日志并写入 start 记录，否则在原日志后追加。"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+        if not resume:
+            self._write({"event": "start", "tech_direction": tech_direction,
+                         "question_types": [list(item) for item in question_types]})
+
+    def _write(self, record):
+        if self._file is None:
+            return
+        line = json.dumps(dict(record, ts=time.time()), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def record_question(self, question_type, question):
+        self._write({"event": "question", "type": question_type, "question": question})
+
+    def record_summary(self, concept, text):
+        self._write({"event": "summary", "concept": concept, "text": text})
+
+    def finish(self, filename):
+        self._write({"event": "done", "filename": filename})
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
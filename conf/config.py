@@ -1,3 +1,80 @@
+import os
+
 # Deepseek API配置
 DEEPSEEK_API_KEY = "sk-*****************************"
-MODEL = ["deepseek-chat", "deepseek-reasoner"][1] # chat是deepseek-v3, reasoner是deepseek-r1
\ No newline at end of file
+DEEPSEEK_BASE_URL = os.environ.get("DEEPSEEK_BASE_URL", "https://api.deepseek.com")  # 可指向本地模拟服务器进行测试
+MODEL = ["deepseek-chat", "deepseek-reasoner"][1] # chat是deepseek-v3, reasoner是deepseek-r1
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434/v1")  # 本地 Ollama 的 OpenAI 兼容接口
+
+# 多后端配置：后端名 -> 参数。kind 为 deepseek / ollama / openai（任意 OpenAI 兼容端点，需提供 base_url）；
+# 非 deepseek 后端可设置 max_concurrent、rpm、max_retries，各自独立限流与熔断
+BACKENDS = {
+    "deepseek": {"kind": "deepseek", "model": MODEL},
+    # "deepseek-chat": {"kind": "deepseek", "model": "deepseek-chat"},
+    # "ollama": {"kind": "ollama", "model": "qwen2.5:14b", "max_concurrent": 2},
+}
+# 按任务（题型名或 "summary"）限定候选后端，未列出的任务可使用全部后端；候选之间按实测速度与错误率分配
+TASK_ROUTES = {
+    # "判断题": ["ollama", "deepseek-chat"],
+    # "填空题": ["ollama", "deepseek-chat"],
+    # "问答题": ["deepseek"],
+    # "summary": ["deepseek"],
+}
+
+# 并发生成配置
+MAX_CONCURRENT_REQUESTS = 8    # 同时在途的 API 请求上限（所有题型共享）
+REQUESTS_PER_MINUTE = 60       # 每分钟最多发出的 API 请求数，0 表示不限制
+MAX_BATCHES_PER_TYPE = 3       # 单个题型同时在途的批次上限
+BATCH_MAX_SIZE = 20            # 单批最多请求的题目数；实际批次大小按各题型历史产出率自动调整
+BATCH_LATENCY_BUDGET = 300     # 单批预计耗时上限（秒），超出时拆成多个并发批次
+BATCH_TOKEN_BUDGET = 7000      # 单批预计输出 token 上限，避免响应被截断
+BATCH_STATS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "batch_stats.json")
+SUMMARY_TOKEN_BUDGET = 8000    # 单个知识点总结请求预计的输入 + 输出 token 上限，知识点按此装入批次
+SUMMARY_TOKENS_PER_CONCEPT = 800  # 每个知识点总结预计的输出 token 数初值，运行中按实际输出校正
+SUMMARY_CLUSTER_THRESHOLD = 0.5  # 关键词未命中已有知识点时，题干 MinHash 相似度达到该值即归入同一知识点
+# 知识点总结按 (技术方向, 知识点) 跨运行缓存，同一方向再次组卷时已总结过的知识点不再请求；设为 None 则不缓存
+SUMMARY_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "summaries")
+STREAM_COMPLETIONS = True      # 以流式方式接收题目，每道题到达即校验、去重，截断的响应也能保留已完成的题目
+
+# HTTP 传输配置
+HTTP_CONNECT_TIMEOUT = 10      # 建立连接超时（秒）
+HTTP_READ_TIMEOUT = 600        # 读取超时（秒），reasoner 单次响应可能需要数分钟
+HTTP_MAX_CONNECTIONS = 32      # 连接池大小，所有请求共享并保持长连接
+RETRY_MAX_RETRIES = 4          # 429、5xx、超时等可重试错误的最大重试次数
+RETRY_BASE_DELAY = 1.0         # 指数退避的基础等待时间（秒），实际等待带随机抖动；响应带 Retry-After 时以其为准
+RETRY_MAX_DELAY = 60.0         # 单次退避等待上限（秒）
+BREAKER_FAILURE_THRESHOLD = 5  # 连续失败多少次后熔断，暂停所有请求
+BREAKER_COOLDOWN = 30          # 熔断后暂停的秒数，之后放行一个探测请求
+
+# 响应缓存配置
+# CACHE_MODE: "off" 不使用缓存；"on" 先查缓存，未命中再请求 API 并写入缓存（用于崩溃后重跑）；
+#             "replay" 只读缓存，未命中直接报错，用于离线重新渲染文档或复现整条流水线
+# 开启缓存后，同一组卷参数的重跑会得到与上次相同的题目，日常出新卷请保持 "off"
+CACHE_MODE = os.environ.get("EXAM_CACHE_MODE", "off")
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "responses")
+CACHE_MAX_BYTES = 512 * 1024 * 1024     # 缓存目录容量上限，超出后按最近访问时间淘汰
+CACHE_MAX_AGE_DAYS = 30                 # 缓存条目最长保留天数
+
+# 本地题库配置
+USE_QUESTION_BANK = True                # 组卷时优先从本地题库抽题，API 只补足缺口
+QUESTION_BANK_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "question_bank.db")
+BANK_REUSE_WINDOW = 5                   # 排除该方向最近 N 份试卷中用过的题目，0 表示不排除
+
+# 去重配置
+DEDUP_THRESHOLD = 0.6                   # 题干 MinHash 估计相似度达到该值即视为近似重复（跨题型）
+DEDUP_AGAINST_HISTORY = True            # 同时与题库中该方向的历史题目比较，需启用本地题库
+
+# 遥测配置：每次 API 调用与各阶段耗时写入 trace.jsonl，指标快照写入 metrics.prom；设为 None 则只在内存中汇总
+TELEMETRY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "telemetry")
+
+# 检查点配置：每道采纳的题目与每个知识点总结追加写入该目录下的 <技术方向>.jsonl，中断后用 python main.py --resume 续跑；设为 None 则不记录
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "checkpoints")
+
+# 批量组卷配置（python main.py --manifest papers.json）
+DEFAULT_QUESTION_TYPES = [("单选题", 30), ("多选题", 30), ("填空题", 10), ("判断题", 10), ("问答题", 10)]  # 默认题型配比
+BATCH_PARALLEL_DIRECTIONS = 4           # 同时生成题目的技术方向数；所有方向共享 MAX_CONCURRENT_REQUESTS 与 REQUESTS_PER_MINUTE
+BATCH_RENDER_WORKERS = os.cpu_count() or 2  # 渲染 docx 的进程数
+VARIANT_FRESH_RATIO = 0.3               # 同一方向的相邻两份试卷之间每个题型替换的题目比例，其余题目复用，1 表示各份试卷互不重复
+
+# 文档渲染配置
+DOCX_SPOOL_SECTIONS = True              # 大段正文（题目、答案解析、知识点总结）边生成边序列化到临时文件，保存时流式写入，内存占用不随题量增长
@@ -0,0 +1,125 @@
+# 近似重复题目检测：字符 shingle + MinHash 签名 + LSH 分桶，插入与查询均为亚线性
+import re
+import zlib
+
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+# 归一化时去掉空白、标点以及 “A.”/“B、” 之类的选项标记，选项顺序变化只影响少量 shingle
+_OPTION_MARKER = re.compile(r'(?<![A-Za-z])[A-H][\.．、]\s*')
+_NON_WORD = re.compile(r'[\s\W_]+', re.UNICODE)
+
+
+def normalize_text(text):
+    text = _OPTION_MARKER.sub('', text or '')
+    return _NON_WORD.sub('', text).lower()
+
+
+def _choose_bands(num_perm, threshold):
+    """选择 (bands, rows)，使 LSH 的 S 曲线拐点 (1/b)^(1/r) 略低于阈值，以召回率优先。"""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        knee = (1.0 / bands) ** (1.0 / rows)
+        error = abs(knee - threshold * 0.85)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class NearDuplicateIndex:
+    """
+    以估计 Jaccard 相似度判断两道题是否近似重复。
+    每道题计算 num_perm 维 MinHash 签名，按 LSH 分桶只与同桶候选精确比较签名，
+    因此插入/查询的代价与已收录题目总数基本无关。
+    """
+
+    def __init__(self, threshold=0.6, num_perm=128, shingle_size=2, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self._buckets = [dict() for _ in range(self.bands)]
+        self._signatures = []
+        self._keys = []
+        self._exact = {}
+        self.checks = 0
+        self.hits = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _shingles(self, normalized):
+        k = self.shingle_size
+        if len(normalized) <= k:
+            return {normalized}
+        return {normalized[i:i + k] for i in range(len(normalized) - k + 1)}
+
+    def signature(self, text):
+        normalized = normalize_text(text)
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in self._shingles(normalized)),
+            dtype=np.uint64,
+        )
+        with np.errstate(over="ignore"):
+            permuted = ((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+        return normalized, permuted.min(axis=0)
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def _query(self, normalized, signature):
+        if normalized in self._exact:
+            return self._exact[normalized], 1.0
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+        best_key, best_sim = None, 0.0
+        for idx in candidates:
+            sim = float(np.mean(self._signatures[idx] == signature))
+            if sim > best_sim:
+                best_key, best_sim = self._keys[idx], sim
+        if best_sim >= self.threshold:
+            return best_key, best_sim
+        return None, best_sim
+
+    def _insert(self, normalized, signature, key):
+        idx = len(self._keys)
+        self._keys.append(key)
+        self._signatures.append(signature)
+        self._exact.setdefault(normalized, key)
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, []).append(idx)
+
+    def query(self, text):
+        """返回 (相似题目的 key, 估计相似度)；没有达到阈值的相似题目时 key 为 None。"""
+        return self._query(*self.signature(text))
+
+    def add(self, text, key=None):
+        """不做检查直接收录，用于题库抽出的题目或历史题目。"""
+        normalized, signature = self.signature(text)
+        self._insert(normalized, signature, key if key is not None else text)
+
+    def check_and_add(self, text, key=None):
+        """
+        检查 text 是否与已收录题目近似重复：重复则返回 (相似题目的 key, 相似度) 且不收录；
+        否则收录并返回 (None, 最高相似度)。同时累计检查数与命中数。
+        """
+        normalized, signature = self.signature(text)
+        self.checks += 1
+        match, sim = self._query(normalized, signature)
+        if match is not None:
+            self.hits += 1
+            return match, sim
+        self._insert(normalized, signature, key if key is not None else text)
+        return None, sim
+
+    def hit_rate(self):
+        return self.hits / self.checks if self.checks else 0.0
@@ -1,26 +1,207 @@
 # Deepseek调用
-from openai import OpenAI
-from conf.config import MODEL
+import threading
+import time
+from collections import defaultdict
+from conf.config import (
+    MODEL, MAX_CONCURRENT_REQUESTS, REQUESTS_PER_MINUTE,
+    CACHE_MODE, CACHE_DIR, CACHE_MAX_BYTES, CACHE_MAX_AGE_DAYS,
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_MAX_CONNECTIONS,
+    RETRY_MAX_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY,
+    BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN,
+)
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache, CacheMissError
+from http_transport import CircuitBreaker, ResilientTransport, shared_openai_client
+from telemetry import get_telemetry, usage_tokens
+
+# 进程内所有 DeepSeekClient 共享同一个限流器，保证并发数与 RPM 为全局上限
+_shared_rate_limiter = RateLimiter(MAX_CONCURRENT_REQUESTS, REQUESTS_PER_MINUTE)
+# 共享的重试与熔断策略：端点异常时所有工作线程一起暂停
+_shared_transport = ResilientTransport(
+    max_retries=RETRY_MAX_RETRIES, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+    breaker=CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN),
+)
+
+def _default_cache():
+    if CACHE_MODE == "off":
+        return None
+    return ResponseCache(CACHE_DIR, CACHE_MAX_BYTES, CACHE_MAX_AGE_DAYS * 24 * 3600)
 
 class DeepSeekClient:
-    def __init__(self, api_key, base_url="https://api.deepseek.com", tech_direction="JAVA"):
+    def __init__(self, api_key, base_url="https://api.deepseek.com", tech_direction="JAVA",
+                 rate_limiter=None, cache=None, cache_mode=CACHE_MODE, transport=None, telemetry=None, model=MODEL):
         self.api_key = api_key
+        self.model = model
         self.base_url = base_url
         self.tech_direction = tech_direction
-        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        self.client = shared_openai_client(
+            self.api_key, self.base_url, connect_timeout=HTTP_CONNECT_TIMEOUT,
+            read_timeout=HTTP_READ_TIMEOUT, max_connections=HTTP_MAX_CONNECTIONS,
+        )
+        self.rate_limiter = rate_limiter or _shared_rate_limiter
+        self.transport = transport or _shared_transport
+        self.telemetry = telemetry or get_telemetry()
+        self.cache_mode = cache_mode
+        self.cache = cache if cache is not None else _default_cache()
+        # 同一请求在一次运行中可能被发送多次（例如同题型的多个批次），
+        # 以出现次序区分缓存键，重跑时按次序回放，避免多个批次拿到同一份响应
+        self._occurrences = defaultdict(int)
+        self._occurrence_lock = threading.Lock()
+        # 每个线程最近一次实际请求的耗时、输出 token 数与结果，供批次规划与多后端路由使用
+        self._local = threading.local()
+
+    def last_call_stats(self):
+        """
+        返回当前线程最近一次请求的 {"latency", "completion_tokens", "prompt_tokens", "cached_tokens"}，
+        cached_tokens 为服务端上下文缓存命中的输入 token 数；命中本地缓存或失败时为 None。
+        """
+        return getattr(self._local, "last_call", None)
+
+    def last_outcome(self):
+        """返回当前线程最近一次请求的结果：ok / error / cache_hit。"""
+        return getattr(self._local, "outcome", None)
+
+    def _record_outcome(self, model, kind, outcome, **kwargs):
+        self._local.outcome = outcome
+        self.telemetry.record_call(model, kind, outcome, **kwargs)
+
+    def _record_call(self, started, usage):
+        prompt_tokens, _, cached_tokens = usage_tokens(usage)
+        self._local.last_call = {
+            "latency": time.monotonic() - started,
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+        }
 
-    def call(self, prompt, model=MODEL, temperature=0.3):
+    def _cache_key(self, model, temperature, system, prompt, cache_id=None):
+        # 提示词随批次规划、题号等运行时状态变化，调用方给出 cache_id（如“题型 + 批次序号”）时
+        # 以它代替提示词作为请求标识，重跑与回放时同一位置的请求总能命中记录的响应
+        base_key = ResponseCache.make_key(model, temperature, system, cache_id or prompt)
+        with self._occurrence_lock:
+            occurrence = self._occurrences[base_key]
+            self._occurrences[base_key] += 1
+        return ResponseCache.make_key(model, temperature, system, f"{base_key}#{occurrence}")
+
+    def _lookup_cache(self, model, temperature, system, prompt, cache_id=None):
+        """返回 (缓存键, 命中的内容)；未启用缓存时缓存键为 None，回放模式未命中时抛出 CacheMissError。"""
+        if self.cache is None or self.cache_mode == "off":
+            return None, None
+        cache_key = self._cache_key(model, temperature, system, prompt, cache_id)
+        cached = self.cache.get(cache_key)
+        if cached is None and self.cache_mode == "replay":
+            raise CacheMissError(f"回放模式下缓存未命中: {prompt[:50]}...")
+        return cache_key, cached
+
+    def _messages(self, system, prompt):
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt},
+        ]
+
+    def _create(self, **kwargs):
+        """
+        发送一次请求：每次尝试都先占用限流名额，失败后在退避等待期间释放名额。
+        流式请求返回时仍占用名额，由调用方在读完响应后调用 rate_limiter.release()。
+        """
+        def attempt():
+            self.rate_limiter.acquire()
+            try:
+                started = time.monotonic()
+                response = self.client.chat.completions.create(**kwargs)
+            except BaseException:
+                self.rate_limiter.release()
+                raise
+            if not kwargs.get("stream"):
+                self.rate_limiter.release()
+            return started, response
+        return self.transport.execute(attempt)
+
+    def call(self, prompt, model=None, temperature=0.3, system=None, cache_id=None):
+        model = model or self.model
+        system = system or f"You are a {self.tech_direction} expert."
+        self._local.last_call = None
+        self._local.outcome = None
+        cache_key, cached = self._lookup_cache(model, temperature, system, prompt, cache_id)
+        if cached is not None:
+            self._record_outcome(model, "call", "cache_hit")
+            return cached
         try:
-            response = self.client.chat.completions.create(
+            started, response = self._create(
                 model=model,
-                messages=[
-                    {"role": "system", "content": f"You are a {self.tech_direction} expert."},
-                    {"role": "user", "content": prompt},
-                ],
+                messages=self._messages(system, prompt),
                 stream=False,
                 temperature=temperature
             )
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            self._record_call(started, response.usage)
         except Exception as e:
             print(f"API Error: {str(e)}")
+            self._record_outcome(model, "call", "error", error=type(e).__name__)
             return None
+        latency = self._local.last_call["latency"]
+        self._record_outcome(model, "call", "ok", latency=latency, ttft=latency, usage=response.usage)
+        if cache_key and content:
+            self.cache.put(cache_key, content, model=model)
+        return content
+
+    def stream(self, prompt, model=None, temperature=0.3, system=None, cache_id=None):
+        """
+        流式调用，逐段产出回复文本（reasoner 的思考过程不产出）。
+        出错时打印错误并结束迭代，已产出的内容由调用方自行保留；只有完整结束的响应才会写入缓存。
+        system 缺省为按技术方向生成的系统提示词；传入与方向无关的固定提示词可让不同方向共享前缀缓存。
+        cache_id 为响应缓存使用的稳定请求标识，缺省时按提示词原文区分请求。
+        """
+        model = model or self.model
+        system = system or f"You are a {self.tech_direction} expert."
+        self._local.last_call = None
+        self._local.outcome = None
+        cache_key, cached = self._lookup_cache(model, temperature, system, prompt, cache_id)
+        if cached is not None:
+            self._record_outcome(model, "stream", "cache_hit")
+            yield cached
+            return
+        parts = []
+        usage = None
+        ttft = None
+        try:
+            started, response = self._create(
+                model=model,
+                messages=self._messages(system, prompt),
+                stream=True,
+                stream_options={"include_usage": True},
+                temperature=temperature
+            )
+        except Exception as e:
+            print(f"API Error: {str(e)}")
+            self._record_outcome(model, "stream", "error", error=type(e).__name__)
+            return
+        # 响应开始后中途出错不再重试，已产出的内容由调用方保留
+        try:
+            with response:
+                for chunk in response:
+                    if getattr(chunk, "usage", None):
+                        usage = chunk.usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if ttft is None:
+                            ttft = time.monotonic() - started
+                        parts.append(delta)
+                        yield delta
+        except Exception as e:
+            print(f"API Error: {str(e)}")
+            self._record_outcome(
+                model, "stream", "error", latency=time.monotonic() - started, ttft=ttft,
+                usage=usage, error=type(e).__name__,
+            )
+            return
+        finally:
+            self.rate_limiter.release()
+        self._record_call(started, usage)
+        self._record_outcome(
+            model, "stream", "ok", latency=self._local.last_call["latency"], ttft=ttft, usage=usage,
+        )
+        if cache_key and parts:
+            self.cache.put(cache_key, "".join(parts), model=model)
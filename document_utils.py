@@ -1,9 +1,11 @@
 import re
+from contextlib import nullcontext
 from docx import Document
 from docx.shared import Pt
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.enum.style import WD_STYLE_TYPE
 from docx.oxml.shared import qn
+from docx_bulk import BulkBodyWriter, save_document
 
 def setup_document_style(doc):
     style = doc.styles['Normal']
@@ -56,21 +58,38 @@ def add_question_section(doc, question_type, questions, answer_sheet, start_ques
         })
     return question_count
 
-def add_answer_section(doc, answer_sheet):
-    """
-    添加答案与解析部分
-    """
-    doc.add_heading("参考答案与解析", level=0)
-    for item in answer_sheet:
-        doc.add_heading(f"题号{item['number']}（{item['type']}）", level=3)
-        doc.add_paragraph(f"题目：{item['question']}")
-        answer_para = doc.add_paragraph()
-        answer_para.add_run("答案：").bold = True
-        answer_para.add_run(item["answer"])
-        analysis_para = doc.add_paragraph()
-        analysis_para.add_run("解析：").bold = True
-        analysis_para.add_run(item["analysis"])
-        doc.add_paragraph()
+def add_question_sections(doc, generated_questions, spool=False):
+    """
+    根据生成的题目数据（Question）写入文档，按照题型分组
+    """
+    with BulkBodyWriter(doc, spool=spool) as writer:
+        for q_type in generated_questions:
+            questions = generated_questions[q_type]
+            writer.heading(f"{q_type}（共{len(questions)}题）", level=2)
+            for q in questions:
+                if q.number is not None:
+                    writer.text(
+                        f"{q.number}. {q.question}（难度：{q.difficulty}/5）",
+                        style='Normal'
+                    )
+                else:
+                    writer.text(q.question or '无题', style='Normal')
+            writer.page_break()
+
+def add_answer_section(doc, answer_sheet, spool=False):
+    """
+    添加答案与解析部分；spool=True 时正文先写入临时文件，需用 save_document 保存
+    """
+    with BulkBodyWriter(doc, spool=spool) as writer:
+        writer.heading("参考答案与解析", level=0)
+        for item in answer_sheet:
+            writer.heading(f"题号{item.number}（{item.type}）", level=3)
+            writer.text(f"题目：{item.question}")
+            writer.paragraph(("答案：", "b"), item.answer)
+            writer.paragraph(("解析：", "b"), item.analysis)
+            if item.concept:
+                writer.paragraph(("知识点：", "b"), f"{item.concept}（见知识点总结）")
+            writer.paragraph()
 
 def add_knowledge_summary_section(doc, summary_text):
     """
@@ -119,37 +138,85 @@ def add_knowledge_summary_section(doc, summary_text):
             continue
         doc.add_paragraph(content.strip())
 
-def add_knowledge_summary_section_template(doc, summary_text):
+def _parse_knowledge_block(block):
+    kp_info = {}
+    current_field = None
+    for line in block.splitlines():
+        line = line.strip()
+        field_match = re.match(r'【(.+?)】：(.*)', line)
+        if field_match:
+            field, content = field_match.groups()
+            kp_info[field.strip()] = content.strip()
+            current_field = field.strip()
+        else:
+            if current_field:
+                kp_info[current_field] += " " + line
+    return kp_info
+
+def iter_knowledge_blocks(chunks):
+    """
+    流式解析模板格式的知识点总结，逐块产出 {字段: 内容}。
+    chunks 为整段文本，或依次到达的文本片段（如逐个产出的知识点块）；每遇到一个 '====' 分隔符
+    就解析并产出前面的块，缓冲区只保留尚未结束的部分，内存占用只与单个块的大小有关。
+    """
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            index = buffer.find("====", start)
+            if index < 0:
+                break
+            block = buffer[start:index].strip()
+            if block:
+                yield _parse_knowledge_block(block)
+            start = index + len("====")
+        buffer = buffer[start:]
+    block = buffer.strip()
+    if block:
+        yield _parse_knowledge_block(block)
+
+def add_knowledge_summary_section_template(doc, summary_text, spool=False):
     """
     将固定模板格式的知识点总结解析后添加到 docx 中。
     模板格式要求：每个知识点块之间以 '====' 分隔，每个块内字段为：
-    【知识点名称】、【原理】、【实际应用】、【注意事项】
+    【知识点名称】、【原理】、【实际应用】、【注意事项】，可选的【相关题目】列出引用该知识点的题号
+    summary_text 可以是整段文本，也可以是逐块产出文本的迭代器，后者边解析边写入
+    spool=True 时正文先写入临时文件，需用 save_document 保存
     """
-    doc.add_heading("知识点总结", level=1)
-    blocks = summary_text.split("====")
-    for block in blocks:
-        block = block.strip()
-        if not block:
-            continue
-        lines = block.splitlines()
-        kp_info = {}
-        current_field = None
-        for line in lines:
-            line = line.strip()
-            field_match = re.match(r'【(.+?)】：(.*)', line)
-            if field_match:
-                field, content = field_match.groups()
-                kp_info[field.strip()] = content.strip()
-                current_field = field.strip()
-            else:
-                if current_field:
-                    kp_info[current_field] += " " + line
-        if "知识点名称" in kp_info:
-            doc.add_heading(f"知识点：{kp_info['知识点名称']}", level=2)
-        for key in ["原理", "实际应用", "注意事项"]:
-            if key in kp_info and kp_info[key]:
-                para = doc.add_paragraph()
-                run = para.add_run(f"{key}：")
-                run.bold = True
-                para.add_run(kp_info[key])
-        doc.add_paragraph("")
+    with BulkBodyWriter(doc, spool=spool) as writer:
+        writer.heading("知识点总结", level=1)
+        for kp_info in iter_knowledge_blocks(summary_text):
+            if "知识点名称" in kp_info:
+                writer.heading(f"知识点：{kp_info['知识点名称']}", level=2)
+            for key in ["原理", "实际应用", "注意事项", "相关题目"]:
+                if key in kp_info and kp_info[key]:
+                    writer.paragraph((f"{key}：", "b"), kp_info[key])
+            writer.text("")
+
+def render_exam_paper(tech_direction, generated_questions, answer_sheet, knowledge_points, filename,
+                      spool=False, span=None):
+    """
+    把已生成的题目、答案表与知识点总结渲染为完整试卷并保存。
+    knowledge_points 为整段文本或逐块产出知识点的可迭代对象；
+    交给进程池并行渲染多份试卷时各参数须可 pickle（知识点传块列表而非迭代器）；
+    span 为可选的 span(阶段名) 上下文管理器工厂，用于记录各阶段耗时。
+    """
+    span = span or (lambda stage: nullcontext())
+    doc = Document()
+    setup_document_style(doc)
+    doc.add_heading(f"{tech_direction}高级开发面试题库", level=0)
+    doc.add_paragraph("\n考生姓名：__________\n考试时间：120分钟\n\n")
+    if knowledge_points:
+        with span("render.knowledge_summary"):
+            add_knowledge_summary_section_template(doc, knowledge_points, spool=spool)
+            doc.add_page_break()
+    with span("render.questions"):
+        add_question_sections(doc, generated_questions, spool=spool)
+    with span("render.answers"):
+        add_answer_section(doc, answer_sheet, spool=spool)
+    with span("save"):
+        save_document(doc, filename)
+    return filename
@@ -0,0 +1,182 @@
+# 大批量 docx 正文写入：直接用 lxml 拼装段落元素并按批插入 w:body，绕开 python-docx 逐段的样式查找与子元素定位
+import io
+import shutil
+import tempfile
+import uuid
+import weakref
+import zipfile
+
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from lxml import etree
+
+_P, _PPR, _PSTYLE = qn("w:p"), qn("w:pPr"), qn("w:pStyle")
+_R, _RPR, _T, _TAB, _BR = qn("w:r"), qn("w:rPr"), qn("w:t"), qn("w:tab"), qn("w:br")
+_B, _I, _VAL, _TYPE, _SPACE = qn("w:b"), qn("w:i"), qn("w:val"), qn("w:type"), qn("xml:space")
+
+# 文档部件 -> {占位标记: 已序列化正文的临时文件}，由 save_document 在保存时展开
+_spools = weakref.WeakKeyDictionary()
+
+
+def _placeholder_xml(marker):
+    return f'<w:p><w:pPr><w:pStyle w:val="{marker}"/></w:pPr></w:p>'.encode("utf-8")
+
+
+class BulkBodyWriter:
+    """
+    生成的 XML 与 doc.add_heading / doc.add_paragraph / run.bold 等接口逐字节一致：
+    - 样式名只解析一次并缓存样式 ID，默认样式（Normal）只写空的 w:pPr；
+    - 文本中的制表符与换行按 python-docx 的规则转成 w:tab、w:br，首尾有空白时加 xml:space="preserve"；
+    - 段落先暂存，每 batch_size 段一次性插到 w:sectPr 之前，避免每段都线性查找插入位置。
+    spool=True 时每批段落序列化后写入临时文件并立即释放，文档中只留一个占位段落，
+    内存占用不再随题量增长；此时必须用 save_document 保存，doc.paragraphs 也读不到这些内容。
+    用法：with BulkBodyWriter(doc) as writer: writer.heading(...); writer.paragraph(...)
+    """
+
+    def __init__(self, doc, batch_size=1000, spool=False):
+        self.doc = doc
+        self.batch_size = batch_size
+        self._body = doc.element.body
+        self._style_ids = {}
+        self._pending = []
+        self._spool = None
+        if spool:
+            marker = f"__bulk_{uuid.uuid4().hex}__"
+            placeholder = OxmlElement("w:p")
+            etree.SubElement(etree.SubElement(placeholder, _PPR), _PSTYLE).set(_VAL, marker)
+            self._insert([placeholder])
+            self._spool = tempfile.TemporaryFile()
+            _spools.setdefault(doc.part, {})[marker] = self._spool
+
+    def _style_id(self, style):
+        if style not in self._style_ids:
+            self._style_ids[style] = self.doc.part.get_style_id(style, WD_STYLE_TYPE.PARAGRAPH)
+        return self._style_ids[style]
+
+    @staticmethod
+    def _add_text(r, text):
+        start = 0
+        for i, char in enumerate(text):
+            if char in "\t\r\n":
+                BulkBodyWriter._add_t(r, text[start:i])
+                etree.SubElement(r, _TAB if char == "\t" else _BR)
+                start = i + 1
+        BulkBodyWriter._add_t(r, text[start:])
+
+    @staticmethod
+    def _add_t(r, text):
+        if not text:
+            return
+        t = etree.SubElement(r, _T)
+        t.text = text
+        if len(text.strip()) < len(text):
+            t.set(_SPACE, "preserve")
+
+    def paragraph(self, *runs, style=None):
+        """
+        追加一个段落；runs 中每项为文本，或 (文本, "b") / (文本, "i") 表示加粗 / 斜体的 run。
+        不传 runs 等价于 doc.add_paragraph()。
+        """
+        p = OxmlElement("w:p")
+        if style is not None:
+            # 与 python-docx 一致：显式指定默认样式时仍会留下一个空的 w:pPr
+            ppr = etree.SubElement(p, _PPR)
+            style_id = self._style_id(style)
+            if style_id is not None:
+                etree.SubElement(ppr, _PSTYLE).set(_VAL, style_id)
+        for run in runs:
+            text, fmt = (run, "") if isinstance(run, str) else run
+            r = etree.SubElement(p, _R)
+            if fmt:
+                rpr = etree.SubElement(r, _RPR)
+                if "b" in fmt:
+                    etree.SubElement(rpr, _B)
+                if "i" in fmt:
+                    etree.SubElement(rpr, _I)
+            self._add_text(r, text)
+        self._append(p)
+        return p
+
+    def text(self, text, style=None):
+        """等价于 doc.add_paragraph(text, style)：空文本不生成 run。"""
+        return self.paragraph(text, style=style) if text else self.paragraph(style=style)
+
+    def heading(self, text, level=1):
+        """等价于 doc.add_heading(text, level)。"""
+        return self.text(text, "Title" if level == 0 else f"Heading {level}")
+
+    def page_break(self):
+        """等价于 doc.add_page_break()。"""
+        p = OxmlElement("w:p")
+        etree.SubElement(etree.SubElement(p, _R), _BR).set(_TYPE, "page")
+        self._append(p)
+
+    def _append(self, p):
+        self._pending.append(p)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def _insert(self, elements):
+        sect_pr = self._body.find(qn("w:sectPr"))
+        if sect_pr is None:
+            self._body.extend(elements)
+        else:
+            index = self._body.index(sect_pr)
+            self._body[index:index] = elements
+
+    def flush(self):
+        if not self._pending:
+            return
+        if self._spool is None:
+            self._insert(self._pending)
+        else:
+            # 放进临时的 w:body 中序列化，子元素不会重复声明命名空间；去掉外层标签后即为正文片段
+            container = OxmlElement("w:body")
+            container.extend(self._pending)
+            xml = etree.tostring(container, encoding="UTF-8", xml_declaration=False)
+            self._spool.write(xml[xml.index(b">") + 1:-len(b"</w:body>")])
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+
+def save_document(doc, path_or_stream):
+    """
+    保存文档；若有 spool 模式写入的正文，则在写出 document.xml 时把占位段落替换为临时文件中的内容。
+    任一占位段落在 document.xml 中找不到时抛出 RuntimeError，不写出缺少整节内容的文档。
+    """
+    sections = _spools.get(doc.part)
+    if not sections:
+        doc.save(path_or_stream)
+        return
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    part_name = doc.part.partname.lstrip("/")
+    with zipfile.ZipFile(buffer) as src:
+        xml = src.read(part_name)
+        found = sorted((xml.find(_placeholder_xml(marker)), marker) for marker in sections)
+        missing = [marker for index, marker in found if index < 0]
+        if missing:
+            raise RuntimeError(f"document.xml 中缺少 spool 占位段落 {missing}，对应的正文会丢失，已停止保存")
+        with zipfile.ZipFile(path_or_stream, "w", zipfile.ZIP_DEFLATED) as dst:
+            for item in src.infolist():
+                if item.filename != part_name:
+                    dst.writestr(item, src.read(item))
+                    continue
+                info = zipfile.ZipInfo(item.filename, date_time=item.date_time)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with dst.open(info, "w", force_zip64=True) as out:
+                    position = 0
+                    for index, marker in found:
+                        out.write(xml[position:index])
+                        spool = sections[marker]
+                        spool.seek(0)
+                        shutil.copyfileobj(spool, out)
+                        position = index + len(_placeholder_xml(marker))
+                    out.write(xml[position:])
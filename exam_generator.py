@@ -1,277 +1,589 @@
-import json, re, time
+import itertools, json, math, os, queue, re, time
+from collections import deque
 from datetime import datetime
 from tqdm import tqdm
-from docx import Document
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 
-from deepseek_client import DeepSeekClient
-from document_utils import setup_document_style, add_answer_section
-from conf.config import DEEPSEEK_API_KEY
+from llm_router import create_router
+from document_utils import render_exam_paper
+from question_bank import QuestionBank
+from dedup_index import NearDuplicateIndex
+from json_stream import QuestionStreamParser
+from question_validator import QuestionValidator
+from batch_planner import BatchPlanner
+from checkpoint import CheckpointJournal
+from question_model import Question
+from response_cache import ResponseCache
+from prompt_templates import (
+    SYSTEM_PROMPT, SUMMARY_PREFIX, question_prompt, summary_entry, summary_prompt, estimate_tokens,
+)
+from knowledge_clusters import (
+    ConceptClusterer, summary_cache_key, split_concept_blocks, block_title, iter_concept_blocks,
+)
+from conf.config import (
+    MAX_CONCURRENT_REQUESTS, MAX_BATCHES_PER_TYPE, SUMMARY_TOKEN_BUDGET, SUMMARY_TOKENS_PER_CONCEPT,
+    USE_QUESTION_BANK, QUESTION_BANK_PATH, BANK_REUSE_WINDOW,
+    DEDUP_THRESHOLD, DEDUP_AGAINST_HISTORY, STREAM_COMPLETIONS, MODEL,
+    BATCH_STATS_PATH, BATCH_MAX_SIZE, BATCH_LATENCY_BUDGET, BATCH_TOKEN_BUDGET, DOCX_SPOOL_SECTIONS,
+    CACHE_MODE, CACHE_DIR, CHECKPOINT_DIR, SUMMARY_CLUSTER_THRESHOLD, SUMMARY_CACHE_DIR, CACHE_MAX_BYTES, CACHE_MAX_AGE_DAYS,
+)
+
+def create_batch_planner():
+    """
+    按配置创建批次规划器。启用响应缓存（CACHE_MODE 非 off）时冻结在缓存目录的统计快照上，
+    记录与回放两次运行按相同的批次大小构造提示词，学习到的统计也不会改变下一次运行的请求。
+    """
+    snapshot_path = os.path.join(CACHE_DIR, "batch_stats.snapshot") if CACHE_MODE != "off" else None
+    return BatchPlanner(
+        BATCH_STATS_PATH, model=MODEL, max_batch_size=BATCH_MAX_SIZE,
+        latency_budget=BATCH_LATENCY_BUDGET, token_budget=BATCH_TOKEN_BUDGET, snapshot_path=snapshot_path,
+    )
 
 class EnhancedInterviewGenerator:
-    def __init__(self, tech_direction="JAVA"):
+    def __init__(self, tech_direction="JAVA", question_bank=None, batch_planner=None, show_progress=True,
+                 paper_name=None):
         self.tech_direction = tech_direction
-        self.api_key = DEEPSEEK_API_KEY
-        self.base_url = "https://api.deepseek.com"
-        self.doc = Document()
-        # 存放所有题目的答案与解析信息，后续用于生成参考答案与解析部分
+        # 检查点与响应缓存的请求标识使用的名称；批量组卷时同一方向的多个清单条目各不相同
+        self.paper_name = paper_name or tech_direction
+        # 按题号顺序存放所有题目（Question），后续用于生成参考答案与解析部分；每道题只存这一份
         self.answer_sheet = []  
         # 用于记录所有题目的编号（全局递增）
         self.question_count = 0  
-        # 存放各题型生成的题目数据，结构：{ "单选题": [q1, q2, ...], "多选题": [...], ... }
+        # 各题型的题目，结构：{ "单选题": [q1, q2, ...], "多选题": [...], ... }，与 answer_sheet 引用同一批对象
         self.generated_questions = {}  
-        self.deepseek_client = DeepSeekClient(api_key=self.api_key, base_url=self.base_url, tech_direction=self.tech_direction)
+        # 按知识点（概念）保存的总结：[{"concept", "name", "numbers", "text"}]，按首题号排序
+        self.concept_summaries = []
+        # 知识点总结统计：概念数 / 缓存或检查点命中数 / 新请求的概念数
+        self.summary_stats = {"concepts": 0, "cached": 0, "requested": 0}
+        # 已采纳题目的来源统计：检查点恢复 / 题库抽取 / API 新生成
+        self.question_sources = {"restored": 0, "bank": 0, "api": 0}
+        self.show_progress = show_progress
+        # 知识点总结流水线状态：题目归类器、待凑批的新概念、已提交的总结批次 future（结果为 {概念 key: 文本}）
+        self._summary_executor = None
+        self._clusterer = None
+        self._summary_pending = []
+        self._summary_futures = []
+        self._summary_start = None
+        self._summary_span_start = None
+        self._restored_summaries = {}  # 从检查点恢复的 {概念 key: 总结文本}
+        # 知识点总结装箱用的 token 估算：共享前缀的 token 数与单个知识点的预计输出 token 数；
+        # 启用响应缓存时不按实际输出校正，保证记录与回放的总结批次划分一致
+        self._summary_prefix_tokens = estimate_tokens(SYSTEM_PROMPT + SUMMARY_PREFIX)
+        self._summary_tokens_per_concept = SUMMARY_TOKENS_PER_CONCEPT
+        self._adapt_summary_estimate = CACHE_MODE == "off"
+        # 知识点总结缓存：同一方向再次组卷时，已总结过的知识点直接复用
+        self.summary_cache = ResponseCache(
+            SUMMARY_CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_age_seconds=CACHE_MAX_AGE_DAYS * 24 * 3600
+        ) if SUMMARY_CACHE_DIR else None
+        # 按 BACKENDS / TASK_ROUTES 在多个后端之间分配请求；只配置 DeepSeek 时与直接调用 DeepSeekClient 相同
+        self.llm_client = create_router(self.tech_direction)
+        self.telemetry = self.llm_client.telemetry
+        # 题目校验器：按题型执行修复与校验规则，并统计修复/剔除次数
+        self.validator = QuestionValidator()
+        # 批次规划器：根据历史产出率、延迟与 token 用量决定每批请求的题目数；批量组卷时由多个生成器共享
+        self.batch_planner = batch_planner or create_batch_planner()
+        # 本地题库：组卷时优先抽题，新生成并通过校验的题目会写回题库
+        if question_bank is None and USE_QUESTION_BANK:
+            question_bank = QuestionBank(QUESTION_BANK_PATH)
+        self.question_bank = question_bank
+        # 启用响应缓存时不从题库抽题、也不与题库历史去重：题库内容随每次运行变化，抽题还带随机性，
+        # 记录与回放会因此采纳不同的题目、发出不同的请求。新题仍写入题库，回放模式下连写入也跳过，离线重跑不改变题库
+        self._bank_reads = question_bank is not None and CACHE_MODE == "off"
+        self._bank_writes = question_bank is not None and CACHE_MODE != "replay"
+        # 检查点日志：逐条记录已采纳的题目与已完成的知识点总结，中断后可续跑
+        self.checkpoint = CheckpointJournal(CHECKPOINT_DIR, tech_direction, self.paper_name) if CHECKPOINT_DIR else None
 
     def _get_filename(self):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M")
         return f"{self.tech_direction}_Interview_{timestamp}.docx"
     
-    def _generate_batch_questions(self, question_type, num=15):
+    def _build_question_prompt(self, question_type, num):
+        """
+        构造生成一批题目的提示词：题型要求与格式示例为固定前缀，技术方向与题数放在末尾，
+        同一题型的请求共享前缀，可命中服务端上下文缓存
+        """
+        return question_prompt(question_type, num, self.tech_direction)
+    
+    def _generate_batch_questions(self, question_type, num=15, on_question=None, sequence=None):
         """
         调用 API 生成一批题目，并对生成的题目进行格式校验（多选题单个题目错误则剔除）
-        若遇到部分题目错误，则仅剔除错误题目，返回格式正确的题目列表。
+        校验前会先尝试确定性修复（规范选项标记、答案字母排序等），修复后仍不合格的题目才剔除，
+        返回格式正确的题目列表。
+        STREAM_COMPLETIONS 开启时以流式方式接收响应，"questions" 数组中每闭合一个对象就立即校验，
+        并通过 on_question 回调交给调用方；响应中途截断或个别对象格式错误时，已收到的题目仍然保留。
+        sequence 为该题型的批次序号，与试卷名称、题型一起作为响应缓存的请求标识，
+        题数随批次规划变化也不影响重跑与回放命中。
         """
-        # 定义各题型要求
-        type_requirements = {
-            "单选题": "每个问题必须包含四个中文选项，用大写字母A. B. C. D. 标记，答案只能有一个正确选项",
-            "多选题": "每个问题必须包含5-7个中文选项，用大写字母A. B. C. D. E. F...标记，答案应有2-7个正确选项。问题内容必须明确列出所有选项，每个选项用大写字母开头（例如：A. 选项内容）",
-            "填空题": "问题中用___________表示空白，答案填具体内容",
-            "判断题": "答案只能是'正确'或'错误'",
-            "问答题": "问题必须是不含任何选项的开放式技术问题，答案为简明扼要的文字描述"
-        }
-        # 定义示例文本
-        question_examples = {
-            "单选题": '"问题内容（示例：\'Java中的final关键字作用？\\nA. 继承\\nB. 重写\\nC. 常量\\nD. 多态\'）"',
-            "多选题": '"问题内容（示例：\'哪些是Java集合接口？\\nA. List\\nB. Set\\nC. Map\\nD. Array\'）"',
-            "问答题": '问题内容（示例："请详细解释C#中垃圾回收机制及其优化方法"）'
-        }
-        
-        if question_type == "问答题":
-            prompt = f"""请生成{num}道{self.tech_direction}高级开发工程师面试{question_type}，
-                要求：
-                1. {type_requirements[question_type]}。
-                2. 所有问题和解析必须使用中文（专有名称和术语除外）。
-                3. 使用严格的JSON格式，仅返回JSON，不包含任何其他文本，格式如下：
-                {{
-                    "questions": [
-                        {{
-                            "question": "请详细解释{self.tech_direction}中某个关键技术原理",
-                            "short_answer": "最简答案",
-                            "detailed_analysis": "300字技术解析",
-                            "keywords": ["关键词"],
-                            "difficulty": "1-5"
-                        }}
-                    ]
-                }}
-                4. 请确保生成的题目各不相同，不要包含任何选项。
-            """
-        else:
-            prompt = f"""请生成{num}道{self.tech_direction}高级开发工程师面试{question_type}，要求：
-                1. {type_requirements[question_type]}
-                2. 所有问题、选项和解析必须使用中文（专有名称和术语除外）
-                3. {"多选题答案字母按升序排列（如ABE）" if question_type == "多选题" else ""}
-                4. 使用严格JSON格式：
-                {{
-                    "questions": [
-                        {{
-                            "question": {question_examples.get(question_type, '"问题内容"')},
-                            "short_answer": "最简答案",
-                            "detailed_analysis": "300字技术解析",
-                            "keywords": ["关键词"],
-                            "difficulty": "1-5"
-                        }}
-                    ]
-                }}
-                5. 不要包含多余文本
-                6. 请确保生成的题目各不相同
-            """
+        prompt = self._build_question_prompt(question_type, num)
+        cache_id = f"questions|{self.paper_name}|{question_type}|{sequence}" if sequence is not None else None
+        valid_questions = []
+        if STREAM_COMPLETIONS:
+            parser = QuestionStreamParser()
+            for chunk in self.llm_client.stream(prompt, task=question_type, system=SYSTEM_PROMPT, cache_id=cache_id):
+                for q in parser.feed(chunk):
+                    with self.telemetry.timer("validation"):
+                        valid = len(valid_questions) < num and self.validator.validate(question_type, q)
+                    if valid:
+                        valid_questions.append(q)
+                        if on_question:
+                            on_question(q)
+            return valid_questions
         
-        result = self.deepseek_client.call(prompt)
+        result = self.llm_client.call(prompt, task=question_type, system=SYSTEM_PROMPT, cache_id=cache_id)
         if not result:
             return []
         result = re.sub(r'```json|```', '', result).strip()
         try:
             data = json.loads(result)
             questions = data.get("questions", [])[:num]
-            valid_questions = []
-            if question_type == "单选题":
-                for q in questions:
-                    valid = True
-                    answer = q.get("short_answer", "")
-                    if len(answer) != 1 or not answer.isalpha():
-                        print(f"单选题答案格式错误: {answer}，已剔除该题")
-                        valid = False
-                    options = re.findall(r'\b[A-Z]\.\s', q.get("question", ""))
-                    if len(options) != 4:
-                        print(f"单选题选项数量不为4: {q.get('question','')}，已剔除该题")
-                        valid = False
-                    if valid:
-                        valid_questions.append(q)
-            elif question_type == "多选题":
-                for q in questions:
-                    valid = True
-                    answer = q.get("short_answer", "")
-                    if len(answer) < 2 or not answer.isalpha() or answer != ''.join(sorted(answer)):
-                        print(f"多选题答案格式错误: {answer}，已剔除该题")
-                        valid = False
-                    if not re.search(r'\b[A-Z]\.\s', q.get("question", "")):
-                        print(f"多选题选项缺失: {q.get('question','')}，已剔除该题")
-                        valid = False
-                    if valid:
-                        valid_questions.append(q)
-            elif question_type == "问答题":
-                for q in questions:
-                    if re.search(r'\b[A-Z]\.\s', q.get("question", "")):
-                        print(f"问答题包含选项: {q.get('question','')}，已剔除该题")
-                    else:
-                        valid_questions.append(q)
-            else:
-                valid_questions = questions
-            return valid_questions
         except Exception as e:
             print(f"解析失败: {str(e)}")
             print("原始内容:", result)
             return []
+        for q in questions:
+            with self.telemetry.timer("validation"):
+                valid = isinstance(q, dict) and self.validator.validate(question_type, q)
+            if valid:
+                valid_questions.append(q)
+                if on_question:
+                    on_question(q)
+        return valid_questions
     
-    def _write_question_sections(self, generated_questions):
+    def _summarize_batch(self, batch):
         """
-        根据生成的题目数据写入文档，按照题型分组
+        调用 API 为一批知识点（概念）各生成一份总结，batch 为 [(概念 key, 概念名, 代表题目)]。
+        返回 {概念 key: 去除代码块后的总结块}，成功的总结同时写入缓存与检查点；整批失败时返回空字典。
+        响应缓存以技术方向与批内概念 key 作为请求标识，不受代表题目文本变化的影响。
         """
-        for q_type in generated_questions:
-            questions = generated_questions[q_type]
-            self.doc.add_heading(f"{q_type}（共{len(questions)}题）", level=2)
-            for q in questions:
-                if "number" in q:
-                    self.doc.add_paragraph(
-                        f"{q['number']}. {q['question']}（难度：{q['difficulty']}/5）",
-                        style='Normal'
-                    )
+        prompt = summary_prompt(
+            self.tech_direction, [summary_entry(i, name, samples) for i, (_, name, samples) in enumerate(batch, 1)]
+        )
+        cache_id = f"summary|{self.tech_direction}|" + ",".join(key for key, _, _ in batch)
+        with self.telemetry.span("summary.batch", concepts=len(batch)):
+            batch_response = self.llm_client.call(prompt, task="summary", system=SYSTEM_PROMPT, cache_id=cache_id)
+        if not batch_response:
+            print(f"某批次知识点总结生成失败（{len(batch)}个知识点）")
+            return {}
+        response = re.sub(r'```.+?```', '', batch_response).strip()
+        blocks = split_concept_blocks(response, [name for _, name, _ in batch])
+        call_stats = self.llm_client.last_call_stats()
+        if self._adapt_summary_estimate and blocks and call_stats and call_stats.get("completion_tokens"):
+            # 按实际输出校正单个知识点的预计 token 数，后续批次据此装箱
+            observed = call_stats["completion_tokens"] / len(blocks)
+            self._summary_tokens_per_concept += 0.3 * (observed - self._summary_tokens_per_concept)
+        if len(blocks) < len(batch):
+            print(f"某批次知识点总结只对应上{len(blocks)}/{len(batch)}个知识点")
+        summaries = {}
+        for i, text in blocks.items():
+            key, name, _ = batch[i]
+            summaries[key] = text
+            if self.summary_cache is not None:
+                self.summary_cache.put(summary_cache_key(self.tech_direction, key), text,
+                                       tech_direction=self.tech_direction, concept=name)
+            if self.checkpoint is not None:
+                self.checkpoint.record_summary(key, text)
+        return summaries
+    
+    def _queue_knowledge_summary(self, questions, flush=False):
+        """
+        知识点总结的流式生产端：把刚编号的题目按关键词与题干相似度归入知识点（概念），
+        只有新出现且检查点与缓存中都没有总结的概念才需要请求。待总结的概念按估算的 token 数装箱：
+        共享前缀、各概念条目与预计输出之和将超出 SUMMARY_TOKEN_BUDGET 时提交一个总结批次，
+        总结请求与题目生成并发进行。flush=True 时把不足一批的剩余概念也提交出去。
+        概念在提交时附上当时已归入的前两道题作为代表题目，之后归入的题目共用同一份总结。
+        每归入一道题就检查一次装箱，批次划分只取决于题号顺序，与题目分几次交来无关。
+        """
+        for q in questions:
+            concept, created = self._clusterer.assign(q)
+            if created:
+                self.summary_stats["concepts"] += 1
+                key = concept["key"]
+                text = self._restored_summaries.get(key)
+                if text is None and self.summary_cache is not None:
+                    text = self.summary_cache.get(summary_cache_key(self.tech_direction, key))
+                if text is None:
+                    self._summary_pending.append(concept)
                 else:
-                    self.doc.add_paragraph(q.get('question', '无题'), style='Normal')
-            self.doc.add_page_break()
+                    self.summary_stats["cached"] += 1
+                    future = Future()
+                    future.set_result({key: text})
+                    self._summary_futures.append(future)
+            self._submit_summary_batches()
+        if flush:
+            self._submit_summary_batches(flush=True)
+    
+    def _submit_summary_batches(self, flush=False):
+        """把待总结的概念按 token 预算装箱提交；flush=False 时不足一批的剩余概念继续等待。"""
+        while self._summary_pending:
+            batch, cost = [], self._summary_prefix_tokens
+            for concept in self._summary_pending:
+                samples = [q.question for q in concept["questions"][:2]]
+                entry_cost = estimate_tokens(summary_entry(len(batch) + 1, concept["name"], samples))
+                entry_cost += self._summary_tokens_per_concept
+                if batch and cost + entry_cost > SUMMARY_TOKEN_BUDGET:
+                    break
+                batch.append((concept["key"], concept["name"], samples))
+                cost += entry_cost
+            if len(batch) == len(self._summary_pending) and not flush:
+                break  # 尚未装满预算，等待更多知识点
+            del self._summary_pending[:len(batch)]
+            if self._summary_start is None:
+                print("开始分批生成详细知识点总结...")
+                self._summary_start = time.time()
+                self._summary_span_start = time.monotonic()
+            self.summary_stats["requested"] += len(batch)
+            self._summary_futures.append(self._summary_executor.submit(self._summarize_batch, batch))
     
     def _add_knowledge_points_summary(self):
         """
-        根据所有生成的题目（包括判断题），调用 API 分批生成一份非常详细的知识点总结，
-        要求对每一道题分别说明其涉及的知识点，详细说明包括：
+        根据所有生成的题目（包括判断题），调用 API 分批生成一份非常详细的知识点总结。
+        题目先归并为知识点（概念），每个概念只说明一次，详细说明包括：
            1. 详细原理和运行机制（要求内容非常详细）
            2. 实际应用场景及具体示例
            3. 使用时的注意事项和防范措施
-        每一道题的说明请按照如下模板输出，并在每道题后输出“====”作为分隔符：
+        每个知识点的说明按照如下模板输出，并在其后输出“====”作为分隔符：
            【知识点名称】：
            【原理】：
            【实际应用】：
            【注意事项】：
-        如果所有题目字数过长，请分批生成，确保每道题都有详细的总结。
+        总结批次已在生成阶段通过 _queue_knowledge_summary 并发提交，此处提交剩余概念、
+        等待所有批次完成，返回按首题号顺序逐块产出知识点的迭代器（每块末尾附【相关题目】），
+        渲染时边产出边解析，不再拼接成整段文本；各概念的总结保存在 concept_summaries 中，
+        每道题的 concept 字段为其知识点名称。
         """
-        import re
-        # 汇总所有题目
-        all_questions = []
-        for q_type, questions in self.generated_questions.items():
-            all_questions.extend(questions)
-        all_questions.sort(key=lambda x: x['number'])
-        total_questions = len(all_questions)
-        batch_size = 10  # 每批处理10道题，可根据需要调整
-        responses = []
-        print("开始分批生成详细知识点总结，请耐心等待...")
-        knowledge_start = time.time()
-        for i in range(0, total_questions, batch_size):
-            batch = all_questions[i:i+batch_size]
-            questions_text = "\n".join([f"{item['number']}. {item['question']}" for item in batch])
-            prompt = (
-                f"请对以下{self.tech_direction}高级开发面试题目中的每一道题分别说明其涉及的知识点，要求：\n"
-                "1. 每一道题的说明应包括：详细原理和运行机制（要求内容非常详细）、实际应用场景及具体示例、使用时的注意事项和防范措施。\n"
-                "2. 请对每一道题单独输出说明，并按照如下模板输出，每一道题的说明后请单独输出一行‘====’作为分隔符：\n"
-                "【知识点名称】：\n"
-                "【原理】：\n"
-                "【实际应用】：\n"
-                "【注意事项】：\n"
-                "请确保所有题目的知识点均被覆盖，并输出为纯文本格式，避免使用 Markdown 语法。\n"
-                "题目如下：\n"
-                f"{questions_text}"
+        self._queue_knowledge_summary([], flush=True)
+        print("等待详细知识点总结生成完成，请耐心等待...")
+        wait_start = time.time()
+        texts = {}
+        for future in self._summary_futures:
+            texts.update(future.result())
+        self._summary_futures = []
+        self.concept_summaries = []
+        for key, concept in self._clusterer.concepts.items():
+            if key not in texts:
+                continue
+            name = block_title(texts[key], concept["name"])
+            for q in concept["questions"]:
+                q.concept = name
+            self.concept_summaries.append(
+                {"concept": key, "name": name, "numbers": list(concept["numbers"]), "text": texts[key]}
             )
-            batch_response = self.deepseek_client.call(prompt)
-            if batch_response:
-                batch_response = re.sub(r'```.+?```', '', batch_response).strip()
-                responses.append(batch_response)
-            else:
-                print("某批次知识点总结生成失败")
+        if self._summary_start is not None:
+            self.telemetry.record_span("summary", self._summary_span_start, time.monotonic())
         knowledge_end = time.time()
-        elapsed = knowledge_end - knowledge_start
+        elapsed = knowledge_end - (self._summary_start or wait_start)
         minutes = int(elapsed // 60)
         seconds = elapsed % 60
-        print(f"详细知识点总结生成完成，耗时 {minutes}分钟{seconds:.2f}秒")
-        return "\n".join(responses)
+        waited = knowledge_end - wait_start
+        stats = self.summary_stats
+        print(f"知识点归类：{self.question_count}道题归为{stats['concepts']}个知识点，"
+              f"复用已有总结{stats['cached']}个，新请求{stats['requested']}个")
+        print(f"详细知识点总结生成完成，耗时 {minutes}分钟{seconds:.2f}秒（题目生成结束后额外等待{waited:.2f}秒）")
+        return iter_concept_blocks(self.concept_summaries)
     
-    def generate_exam_paper(self, question_types):
-        overall_start = time.time()
-        from document_utils import add_knowledge_summary_section_template
-        setup_document_style(self.doc)
-        self.doc.add_heading(f"{self.tech_direction}高级开发面试题库", level=0)
-        self.doc.add_paragraph("\n考生姓名：__________\n考试时间：120分钟\n\n")
-        
-        # 存储各题型生成的题目数据
-        self.generated_questions = {}
+    def _generate_all_types(self, question_types, max_attempts=5, on_numbered=None, restored=None):
+        """
+        并发生成所有题型的题目：各题型同时发起请求，单个题型也可同时有多个批次在途。
+        在途批次上限由 MAX_BATCHES_PER_TYPE 控制，全局并发与 RPM 由各后端的限流器控制。
+        工作线程每校验通过一道题就通过事件队列交给主线程，主线程逐题去重、计数并推进进度条，
+        因此去重索引与进度条无需加锁。
+        题号按题型顺序编排：排在最前面的未完成题型，其新题目可立即编号；后续题型的题目
+        要等前面所有题型都结束后才能编号，保证题号与串行生成时一致且可复现。
+        每批新编号的题目会回调 on_numbered，供知识点总结等下游阶段流式消费。
+        启用题库时先从题库抽题，只对缺口部分调用 API。
+        去重使用跨题型共享的近似重复索引，改写措辞或调换选项顺序的题目同样会被拦截；
+        DEDUP_AGAINST_HISTORY 开启时索引还会预先收录题库中该方向的全部历史题目。
+        restored 为从检查点恢复的 {题型: [题目]}，按原采纳顺序排在最前，因此题号与中断前一致；
+        每道新采纳的题目都会写入检查点日志。
+        """
+        self.dedup_index = NearDuplicateIndex(threshold=DEDUP_THRESHOLD)
+        with_history = self._bank_reads and DEDUP_AGAINST_HISTORY
+        if with_history:
+            for bank_id, text in self.question_bank.question_texts(self.tech_direction):
+                self.dedup_index.add(text, key=("history", bank_id))
+        states = {}
+        for position, (q_type, total) in enumerate(question_types):
+            states[q_type] = {
+                "total": total,
+                "accepted": [],
+                "generated": [],
+                "attempts": 0,
+                "requested": 0,  # 在途批次按历史产出率预计能得到的题目数之和
+                "inflight": 0,
+                "submitted": 0,    # 已提交的批次数，下一批的序号
+                "order": deque(),  # 在途批次 id，按提交顺序排列
+                "failed": False,
+                "pbar": tqdm(total=total, desc=f"生成 {q_type}", ncols=80, position=position,
+                             disable=not self.show_progress),
+                "started": time.monotonic(),
+                "span_recorded": False,
+            }
+            state = states[q_type]
+            if restored and restored.get(q_type):
+                state["accepted"].extend(restored[q_type][:total])
+                self.question_sources["restored"] += len(state["accepted"])
+                for q in state["accepted"]:
+                    self.dedup_index.add(q["question"], key=(q_type, q["question"]))
+                state["pbar"].update(len(state["accepted"]))
+            if self._bank_reads and len(state["accepted"]) < total:
+                restored_ids = {q.get("bank_id") for q in state["accepted"]}
+                from_bank = [
+                    q for q in self.question_bank.select_questions(
+                        self.tech_direction, q_type, total - len(state["accepted"]),
+                        exclude_recent_papers=BANK_REUSE_WINDOW,
+                    )
+                    if q["bank_id"] not in restored_ids
+                ]
+                state["accepted"].extend(from_bank)
+                self.question_sources["bank"] += len(from_bank)
+                for q in from_bank:
+                    if not with_history:
+                        self.dedup_index.add(q["question"], key=("bank", q["bank_id"]))
+                    if self.checkpoint is not None:
+                        self.checkpoint.record_question(q_type, q)
+                state["pbar"].update(len(from_bank))
+                if from_bank:
+                    print(f"{q_type}从题库中抽取{len(from_bank)}题，需新生成{total - len(state['accepted'])}题")
         
-        # 先生成各类题目，但不直接写入文档
-        for q_type, total in question_types:
-            generated = []
-            remaining = total
-            seen_questions = set()
-            attempts = 0
-            max_attempts = 5
-            pbar = tqdm(total=total, desc=f"生成 {q_type}", ncols=80)
-            while remaining > 0 and attempts < max_attempts:
-                batch_num = remaining if remaining < 10 else 10
-                questions = self._generate_batch_questions(q_type, batch_num)
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+            # 工作线程把逐题结果与批次结束事件放入队列，由主线程统一消费
+            events = queue.Queue()
+            batches = {}  # 批次 id -> [题型, 请求题数, 预计产出, 已采纳题数, 题型已满后多出的合格题数]
+            batch_ids = itertools.count()
+            
+            def run_batch(batch_id, q_type, batch_num, sequence):
+                try:
+                    questions = self._generate_batch_questions(
+                        q_type, batch_num,
+                        on_question=lambda q: events.put(("question", batch_id, q)),
+                        sequence=sequence,
+                    )
+                except BaseException as e:
+                    events.put(("error", batch_id, e))
+                else:
+                    events.put(("done", batch_id, (questions, self.llm_client.last_call_stats())))
+            
+            def schedule(q_type):
+                state = states[q_type]
+                while (not state["failed"]
+                       and state["attempts"] < max_attempts
+                       and state["inflight"] < MAX_BATCHES_PER_TYPE):
+                    # 预计产出为浮点累加，先舍入再取整，避免残留误差凭空多出一个批次
+                    shortfall = math.ceil(round(state["total"] - len(state["accepted"]) - state["requested"], 6))
+                    batch_num = self.batch_planner.plan(q_type, shortfall)
+                    if batch_num <= 0:
+                        break
+                    expected = batch_num * self.batch_planner.expected_yield(q_type)
+                    batch_id = next(batch_ids)
+                    batches[batch_id] = [q_type, batch_num, expected, 0, 0]
+                    executor.submit(run_batch, batch_id, q_type, batch_num, state["submitted"])
+                    state["submitted"] += 1
+                    state["order"].append(batch_id)
+                    state["requested"] += expected
+                    state["inflight"] += 1
+            
+            def is_finished(state):
+                if state["inflight"]:
+                    return False
+                return (len(state["accepted"]) >= state["total"]
+                        or state["failed"]
+                        or state["attempts"] >= max_attempts)
+            
+            def record_type_span(q_type):
+                state = states[q_type]
+                if not state["span_recorded"] and is_finished(state):
+                    state["span_recorded"] = True
+                    self.telemetry.record_span(
+                        f"generate.{q_type}", state["started"], time.monotonic(),
+                        requested=state["total"], produced=len(state["accepted"]),
+                    )
+            
+            type_order = list(states)
+            head = [0]  # 当前可编号的题型下标（前面的题型均已结束）
+            
+            def number_ready_questions():
+                newly_numbered = []
+                while head[0] < len(type_order):
+                    q_type = type_order[head[0]]
+                    state = states[q_type]
+                    for q in state["accepted"][len(state["generated"]):]:
+                        self.question_count += 1
+                        question = Question.from_dict(self.question_count, q_type, q)
+                        state["generated"].append(question)
+                        self.answer_sheet.append(question)
+                        newly_numbered.append(question)
+                    if not is_finished(state):
+                        break
+                    head[0] += 1
+                if newly_numbered and on_numbered:
+                    on_numbered(newly_numbered)
+            
+            for q_type in states:
+                schedule(q_type)
+                record_type_span(q_type)
+            number_ready_questions()
+            
+            def handle(kind, batch_id, payload):
+                q_type, batch_num, expected, accepted_in_batch, surplus = batches[batch_id]
+                state = states[q_type]
+                if kind == "question":
+                    q = payload
+                    if len(state["accepted"]) >= state["total"]:
+                        batches[batch_id][4] += 1
+                        return
+                    with self.telemetry.timer("dedup"):
+                        match, similarity = self.dedup_index.check_and_add(q["question"], key=(q_type, q["question"]))
+                    if match is not None:
+                        print(f"检测到重复题目（相似度{similarity:.2f}），已跳过: {q['question']}")
+                        return
+                    if self._bank_writes:
+                        self.question_bank.add_questions(self.tech_direction, q_type, [q])
+                    if self.checkpoint is not None:
+                        self.checkpoint.record_question(q_type, q)
+                    state["accepted"].append(q)
+                    self.question_sources["api"] += 1
+                    batches[batch_id][3] += 1
+                    state["pbar"].update(1)
+                    number_ready_questions()
+                    return
+                
+                del batches[batch_id]
+                state["inflight"] -= 1
+                state["requested"] = state["requested"] - expected if state["inflight"] else 0
+                if kind == "error":
+                    raise payload
+                questions, call_stats = payload
+                if questions is not None:
+                    call_stats = call_stats or {}
+                    self.batch_planner.record(
+                        q_type, batch_num, accepted_in_batch + surplus,
+                        latency=call_stats.get("latency"),
+                        output_tokens=call_stats.get("completion_tokens"),
+                    )
                 if questions is None:
                     print(f"{q_type}生成失败，请检查API设置")
-                    break
-                unique_questions = []
-                for q in questions:
-                    if q["question"] not in seen_questions:
-                        seen_questions.add(q["question"])
-                        self.question_count += 1
-                        q_with_num = q.copy()
-                        q_with_num["number"] = self.question_count
-                        q_with_num["type"] = q_type  # 添加题型信息
-                        q_with_num["answer"] = q.get("short_answer", "")
-                        q_with_num["analysis"] = q.get("detailed_analysis", "")
-                        unique_questions.append(q_with_num)
-                        self.answer_sheet.append(q_with_num)
-                    else:
-                        print(f"检测到重复题目，已跳过: {q['question']}")
-                if len(unique_questions) == 0:
-                    attempts += 1
-                    print(f"当前批次{q_type}重复或格式错误较多，尝试补充次数：{attempts}")
+                    state["failed"] = True
+                elif accepted_in_batch == 0:
+                    if len(state["accepted"]) < state["total"]:
+                        state["attempts"] += 1
+                        print(f"当前批次{q_type}重复或格式错误较多，尝试补充次数：{state['attempts']}")
                 else:
-                    attempts = 0
-                generated.extend(unique_questions)
-                pbar.update(len(unique_questions))
-                remaining = total - len(generated)
-            pbar.close()
-            if remaining > 0:
-                print(f"警告：{q_type}最终未生成足够题目，期望{total}题，实际获得{len(generated)}题")
-            self.generated_questions[q_type] = generated
+                    state["attempts"] = 0
+                schedule(q_type)
+                record_type_span(q_type)
+                number_ready_questions()
+            
+            # 同一题型的批次按提交顺序处理：后提交的批次先返回时，其事件暂存到前面的批次结束后再处理，
+            # 采纳顺序与题号因此不受各批次完成先后的影响，重跑与回放时可复现
+            held = {}  # 批次 id -> 暂存的 [(事件类型, 内容)]
+            while batches:
+                kind, batch_id, payload = events.get()
+                order = states[batches[batch_id][0]]["order"]
+                held.setdefault(batch_id, []).append((kind, payload))
+                while order and held.get(order[0]):
+                    head_id = order[0]
+                    kind, payload = held[head_id].pop(0)
+                    if kind != "question":
+                        order.popleft()
+                        del held[head_id]
+                    handle(kind, head_id, payload)
         
-        # 根据题目生成知识点总结，并插入到考生信息之后
-        knowledge_points = self._add_knowledge_points_summary()
-        if knowledge_points:
-            add_knowledge_summary_section_template(self.doc, knowledge_points)
-            self.doc.add_page_break()
+        index = self.dedup_index
+        print(self.validator.summary())
+        if len(self.llm_client.backends) > 1:
+            print(self.llm_client.summary())
+        print("批次统计：" + "；".join(self.batch_planner.summary(q_type) for q_type in states))
+        self.batch_planner.save()
+        print(f"去重统计：共检查{index.checks}题，拦截近似重复{index.hits}题，命中率{index.hit_rate():.1%}")
+        for q_type, state in states.items():
+            state["pbar"].close()
+            if len(state["generated"]) < state["total"]:
+                print(f"警告：{q_type}最终未生成足够题目，期望{state['total']}题，实际获得{len(state['generated'])}题")
+        return {q_type: state["generated"] for q_type, state in states.items()}
+    
+    def _restore_checkpoint(self, question_types, resume):
+        """
+        打开检查点日志。resume=True 且存在未完成的日志时恢复其中的题目与知识点总结，
+        并沿用日志中的题型配比以保证题号不变；否则开始新日志。返回 (题型配比, 已恢复的题目)。
+        """
+        if self.checkpoint is None:
+            if resume:
+                print("未配置 CHECKPOINT_DIR，无法续跑，开始新的生成任务")
+            return question_types, None
+        restored = self.checkpoint.load() if resume else None
+        if resume and restored is None:
+            print("没有可续跑的检查点，开始新的生成任务")
+        if restored is None:
+            self.checkpoint.open(self.tech_direction, question_types)
+            return question_types, None
+        if restored["question_types"] and restored["question_types"] != [tuple(item) for item in question_types]:
+            print("题型配比与检查点不一致，沿用检查点中的配比以保持题号不变")
+            question_types = restored["question_types"]
+        self._restored_summaries = restored["summaries"]
+        count = sum(len(questions) for questions in restored["questions"].values())
+        print(f"从检查点恢复{count}道题目、{len(restored['summaries'])}个知识点总结：{self.checkpoint.path}")
+        self.checkpoint.open(resume=True)
+        return question_types, restored["questions"]
+
+    def collect_questions(self, question_types, resume=False):
+        """
+        并发生成各题型题目，已编号的题目同时流式提交知识点总结；不渲染文档。
+        结果保存在 generated_questions、answer_sheet 与 concept_summaries 中，
+        返回 (实际使用的题型配比, 逐块产出知识点总结的迭代器)。
+        """
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as summary_executor:
+            self._summary_executor = summary_executor
+            self._clusterer = ConceptClusterer(self.tech_direction, threshold=SUMMARY_CLUSTER_THRESHOLD)
+            self._summary_pending = []
+            self._summary_futures = []
+            self._summary_start = None
+            self._restored_summaries = {}
+            self.summary_stats = {"concepts": 0, "cached": 0, "requested": 0}
+            question_types, restored = self._restore_checkpoint(question_types, resume)
+            self.generated_questions = self._generate_all_types(
+                question_types, on_numbered=self._queue_knowledge_summary, restored=restored
+            )
+            knowledge_points = self._add_knowledge_points_summary()
+        return question_types, knowledge_points
+
+    def finish_paper(self, filename, answer_sheet=None):
+        """试卷保存后在题库中登记用到的题目；answer_sheet 缺省为本生成器的答案表。"""
+        if self._bank_writes:
+            self.question_bank.record_paper(
+                self.tech_direction,
+                [q.bank_id for q in (answer_sheet or self.answer_sheet) if q.bank_id is not None],
+                filename=filename,
+            )
+
+    def generate_exam_paper(self, question_types, resume=False):
+        overall_start = time.time()
+        paper_span_start = time.monotonic()
+        # 并发生成各类题目，但不直接写入文档；已编号的题目同时流式提交知识点总结
+        _, knowledge_points = self.collect_questions(question_types, resume)
+        if self.concept_summaries:
             print("知识点总结添加成功")
         else:
+            knowledge_points = None
             print("未生成知识点总结")
         
-        # 将各题型题目写入文档
-        self._write_question_sections(self.generated_questions)
-        
-        overall_end = time.time()
-        total_elapsed = overall_end - overall_start
+        filename = self._get_filename()
+        render_exam_paper(
+            self.tech_direction, self.generated_questions, self.answer_sheet, knowledge_points, filename,
+            spool=DOCX_SPOOL_SECTIONS, span=self.telemetry.span,
+        )
+        if self.checkpoint is not None:
+            self.checkpoint.finish(filename)
+        self.finish_paper(filename)
+        total_elapsed = time.time() - overall_start
         minutes = int(total_elapsed // 60)
         seconds = total_elapsed % 60
-        add_answer_section(self.doc, self.answer_sheet)
-        filename = self._get_filename()
-        self.doc.save(filename)
         print(f"生成成功！文件已保存为 {filename}, 共{self.question_count}题")
         print(f"总耗时: {minutes}分钟{seconds:.2f}秒")
+        print(f"Token 用量：{self.telemetry.token_summary()}")
+        self.telemetry.record_span(
+            "paper", paper_span_start, time.monotonic(),
+            tech_direction=self.tech_direction, questions=self.question_count, filename=filename,
+        )
+        snapshot = self.telemetry.write_snapshot()
+        if snapshot:
+            print(f"调用追踪与指标快照已写入 {os.path.dirname(snapshot)}")
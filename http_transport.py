@@ -0,0 +1,178 @@
+# 共享 HTTP 传输层：连接池复用、带抖动的指数退避重试（遵循 Retry-After）与全局熔断
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+from openai import APIConnectionError, APIStatusError, APITimeoutError, OpenAI
+
+try:
+    import h2  # noqa: F401  安装了 h2 时启用 HTTP/2
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+_clients_lock = threading.Lock()
+_http_client = None
+_openai_clients = {}
+
+
+def shared_http_client(connect_timeout=10.0, read_timeout=600.0, max_connections=32):
+    """进程内共享的 httpx 连接池，保持长连接，可用时启用 HTTP/2。"""
+    global _http_client
+    with _clients_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                http2=_HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                    keepalive_expiry=60.0,
+                ),
+            )
+        return _http_client
+
+
+def shared_openai_client(api_key, base_url, **http_options):
+    """按 (api_key, base_url) 复用 OpenAI 客户端；SDK 自带的重试关闭，由 ResilientTransport 统一处理。"""
+    key = (api_key, base_url)
+    client = _openai_clients.get(key)
+    if client is None:
+        http_client = shared_http_client(**http_options)
+        with _clients_lock:
+            client = _openai_clients.get(key)
+            if client is None:
+                client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+                _openai_clients[key] = client
+    return client
+
+
+def is_retryable(error):
+    """429、5xx、超时与连接错误可以重试；其余错误（如 401、400）重试也不会成功。"""
+    if isinstance(error, (APITimeoutError, APIConnectionError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def retry_after_seconds(error):
+    """解析响应头中的 Retry-After（秒数或 HTTP 日期），没有时返回 None。"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class CircuitBreaker:
+    """
+    连续 failure_threshold 次可重试错误后熔断 cooldown 秒，期间所有工作线程在 before_call 中等待；
+    冷却结束后进入半开状态，只放行一个探测请求，成功则恢复，失败则再次熔断。
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, cooldown=30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._cond = threading.Condition()
+
+    def before_call(self):
+        with self._cond:
+            while True:
+                if self.state == self.CLOSED:
+                    return
+                if self.state == self.OPEN:
+                    remaining = self._opened_at + self.cooldown - time.monotonic()
+                    if remaining > 0:
+                        self._cond.wait(remaining)
+                        continue
+                    self.state = self.HALF_OPEN
+                if not self._probing:
+                    self._probing = True
+                    return
+                self._cond.wait()
+
+    def record_success(self):
+        with self._cond:
+            self._failures = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                print("API 端点已恢复，熔断解除")
+            self.state = self.CLOSED
+            self._cond.notify_all()
+
+    def record_failure(self):
+        with self._cond:
+            self._failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"API 端点连续失败{self._failures}次，暂停所有请求{self.cooldown:.0f}秒")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._cond.notify_all()
+
+    def release_probe(self):
+        """探测请求以不可重试的错误结束时，释放探测名额但不改变熔断状态。"""
+        with self._cond:
+            self._probing = False
+            self._cond.notify_all()
+
+
+class ResilientTransport:
+    """对单次请求函数做熔断检查与带抖动的指数退避重试。"""
+
+    def __init__(self, max_retries=4, base_delay=1.0, max_delay=60.0, breaker=None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+
+    def backoff(self, attempt, error=None):
+        retry_after = retry_after_seconds(error) if error is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # full jitter：在 [0, base * 2^attempt] 内均匀取值，避免所有线程同时重试
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def execute(self, func):
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = func()
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release_probe()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt, e)
+                attempt += 1
+                print(f"请求失败（{type(e).__name__}），{delay:.1f}秒后第{attempt}次重试")
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
@@ -0,0 +1,96 @@
+# 流式 JSON 解析：从逐段到达的模型输出中，按完整对象逐个取出 "questions" 数组里的题目
+import json
+
+
+class QuestionStreamParser:
+    """
+    增量扫描 {"questions": [ {...}, {...}, ... ]} 形式的文本。
+    每当数组中的一个对象闭合，就立即用 json.loads 解析并返回，不必等待整个响应结束；
+    个别对象格式错误只丢弃该对象，响应在中途被截断时已闭合的对象仍然保留。
+    ```json 代码块标记等数组之外的内容会被忽略。
+    """
+
+    def __init__(self, key="questions"):
+        self._marker = f'"{key}"'
+        self._buffer = ""
+        self._pos = 0            # 下一个待扫描字符的位置
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start = None       # 当前对象在 buffer 中的起始位置
+        self.errors = 0
+
+    def feed(self, chunk):
+        """送入一段新文本，返回本段文本中新闭合并解析成功的对象列表。"""
+        if self._done or not chunk:
+            return []
+        self._buffer += chunk
+        if not self._in_array and not self._find_array_start():
+            return []
+        objects = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._start is not None:
+                    obj = self._parse(buffer[self._start:i + 1])
+                    if obj is not None:
+                        objects.append(obj)
+                    self._start = None
+            elif ch == "]" and self._depth == 0:
+                self._done = True
+                i += 1
+                break
+            i += 1
+        # 丢弃已处理的前缀，只保留当前未闭合对象，避免缓冲区随响应长度增长
+        keep_from = self._start if self._start is not None else i
+        self._buffer = buffer[keep_from:]
+        if self._start is not None:
+            self._start = 0
+        self._pos = i - keep_from
+        return objects
+
+    def _find_array_start(self):
+        marker_at = self._buffer.find(self._marker)
+        if marker_at < 0:
+            return False
+        bracket_at = self._buffer.find("[", marker_at + len(self._marker))
+        if bracket_at < 0:
+            return False
+        self._in_array = True
+        self._pos = bracket_at + 1
+        return True
+
+    def _parse(self, text):
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError as e:
+            self.errors += 1
+            print(f"题目解析失败，已丢弃该题: {str(e)}")
+            return None
+        return obj if isinstance(obj, dict) else None
+
+
+def iter_questions(chunks, key="questions"):
+    """依次产出文本片段流中 key 数组里每个完整闭合的对象。"""
+    parser = QuestionStreamParser(key)
+    for chunk in chunks:
+        for obj in parser.feed(chunk):
+            yield obj
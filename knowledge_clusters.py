@@ -0,0 +1,106 @@
+# 知识点聚类：按关键词与题干相似度把题目归入概念簇，每个概念只总结一次，总结按 (技术方向, 概念) 跨运行缓存
+import hashlib
+import json
+import re
+import unicodedata
+
+from dedup_index import NearDuplicateIndex
+
+_FIELD_NAME = re.compile(r'【知识点名称】：(.*)')
+
+
+def normalize_concept(text):
+    """概念名规范化：全角转半角、转小写并去掉空白，“Volatile 关键字”与“volatile关键字”视为同一概念。"""
+    return re.sub(r'\s+', '', unicodedata.normalize("NFKC", text or "")).lower()
+
+
+def summary_cache_key(tech_direction, concept_key):
+    payload = json.dumps(["concept_summary", normalize_concept(tech_direction), concept_key], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ConceptClusterer:
+    """
+    按题号顺序逐题归类，返回题目所属的概念（dict：key / name / numbers / questions）：
+    1. 题目的任一关键词已是某个概念的主关键词时归入该概念，主关键词优先；
+    2. 否则按题干 MinHash 相似度查找已归类的题目，相似度达到 threshold 时归入其概念；
+    3. 否则以第一个关键词（没有关键词时取题干摘要）新建概念。
+    与技术方向同名的关键词（如 JAVA 方向的“Java”）过于宽泛，不参与归类。
+    """
+
+    def __init__(self, tech_direction, threshold=0.5):
+        self._generic = {normalize_concept(tech_direction)}
+        self._generic.update(normalize_concept(part) for part in re.split(r'[-/\s]+', tech_direction) if part)
+        self._index = NearDuplicateIndex(threshold=threshold)
+        self._by_keyword = {}  # 规范化关键词 -> 概念 key
+        self.concepts = {}     # 概念 key -> 概念，按首次出现（即首题号）顺序排列
+
+    def _keywords(self, question):
+        keywords = []
+        for keyword in question.keywords:  # Question 创建时已规范为非空字符串
+            normalized = normalize_concept(keyword)
+            if normalized and normalized not in self._generic and all(normalized != k for k, _ in keywords):
+                keywords.append((normalized, keyword))
+        return keywords
+
+    def assign(self, question):
+        """把一道已编号的题目（Question）归入概念，返回 (概念, 是否新建)。"""
+        keywords = self._keywords(question)
+        key = next((self._by_keyword[k] for k, _ in keywords if k in self._by_keyword), None)
+        if key is None:
+            key, _ = self._index.query(question.question)
+        created = key is None
+        if created:
+            if keywords:
+                key, name = keywords[0]
+            else:
+                name = question.question.splitlines()[0][:30]
+                key = "q:" + hashlib.sha1(normalize_concept(question.question).encode("utf-8")).hexdigest()[:16]
+            self.concepts[key] = {"key": key, "name": name, "numbers": [], "questions": []}
+        if keywords:
+            self._by_keyword.setdefault(keywords[0][0], key)
+        self._index.add(question.question, key=key)
+        concept = self.concepts[key]
+        concept["numbers"].append(question.number)
+        concept["questions"].append(question)
+        return concept, created
+
+
+def split_concept_blocks(text, names):
+    """
+    把一次总结响应拆成各概念的知识点块，返回 {下标: 块文本}。块数与概念数一致时按顺序对应；
+    否则按【知识点名称】与概念名互相包含来对应，对不上的概念视为总结失败。
+    """
+    blocks = [block.strip() for block in text.split("====") if block.strip()]
+    if len(blocks) == len(names):
+        return dict(enumerate(blocks))
+    matched = {}
+    normalized_names = [normalize_concept(name) for name in names]
+    for block in blocks:
+        match = _FIELD_NAME.search(block)
+        title = normalize_concept(match.group(1)) if match else ""
+        for i, name in enumerate(normalized_names):
+            if i not in matched and title and (name in title or title in name):
+                matched[i] = block
+                break
+    return matched
+
+
+def block_title(text, default):
+    match = _FIELD_NAME.search(text)
+    return match.group(1).strip() if match and match.group(1).strip() else default
+
+
+def iter_concept_blocks(entries, number_map=None):
+    """
+    逐个产出知识点块（以“====”结尾），每个块末尾追加【相关题目】字段列出引用该知识点的题号，
+    供渲染端流式解析，不拼接整段文本。entries 为 [{"numbers": [...], "text": ...}]；
+    number_map 为 {原题号: 新题号}，给出时只保留映射中的题目并改用新题号，不含任何映射题目的概念整块省略。
+    """
+    for entry in entries:
+        numbers = entry["numbers"]
+        if number_map is not None:
+            numbers = sorted(number_map[n] for n in numbers if n in number_map)
+        if numbers:
+            related = "、".join(str(n) for n in numbers)
+            yield f"{entry['text']}\n【相关题目】：第{related}题\n====\n"
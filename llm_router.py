@@ -0,0 +1,183 @@
+# 多后端路由：DeepSeek 与本地 Ollama / 任意 OpenAI 兼容端点，按任务筛选候选后端，再按实测速度、错误率与在途请求数分配
+import threading
+
+from conf.config import (
+    MODEL, BACKENDS, TASK_ROUTES, DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, OLLAMA_BASE_URL,
+    RETRY_MAX_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY, BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN,
+)
+from deepseek_client import DeepSeekClient
+from http_transport import CircuitBreaker, ResilientTransport
+from rate_limiter import RateLimiter
+from response_cache import CacheMissError
+
+# 非 DeepSeek 后端的限流器与熔断器按后端名在进程内共享，批量组卷时多个生成器共用同一份预算
+_resources = {}
+_resources_lock = threading.Lock()
+
+
+def _backend_resources(name, spec):
+    with _resources_lock:
+        if name not in _resources:
+            _resources[name] = (
+                RateLimiter(spec.get("max_concurrent", 4), spec.get("rpm", 0)),
+                ResilientTransport(
+                    max_retries=spec.get("max_retries", RETRY_MAX_RETRIES), base_delay=RETRY_BASE_DELAY,
+                    max_delay=RETRY_MAX_DELAY, breaker=CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN),
+                ),
+            )
+        return _resources[name]
+
+
+def create_backend(name, spec, tech_direction):
+    """
+    按配置创建一个后端客户端，kind 取值：
+    - deepseek：DeepSeek 官方接口，使用 DeepSeekClient 的全局限流器与熔断器；
+    - ollama：本地 Ollama 的 OpenAI 兼容接口（/v1），无需密钥；
+    - openai：任意 OpenAI 兼容端点（vLLM、LM Studio 等），需提供 base_url。
+    后两者各自独立限流与熔断，云端被限流或熔断时不影响本地后端。
+    """
+    kind = spec.get("kind", "openai")
+    model = spec.get("model", MODEL)
+    if kind == "deepseek":
+        return DeepSeekClient(
+            api_key=spec.get("api_key", DEEPSEEK_API_KEY), base_url=spec.get("base_url", DEEPSEEK_BASE_URL),
+            tech_direction=tech_direction, model=model,
+        )
+    if kind == "ollama":
+        # Ollama 不校验密钥，但 OpenAI SDK 要求非空
+        base_url, api_key = spec.get("base_url", OLLAMA_BASE_URL), spec.get("api_key", "ollama")
+    elif kind == "openai":
+        base_url, api_key = spec["base_url"], spec.get("api_key", "EMPTY")
+    else:
+        raise ValueError(f"后端 {name} 的类型未知：{kind}")
+    rate_limiter, transport = _backend_resources(name, spec)
+    return DeepSeekClient(
+        api_key=api_key, base_url=base_url, tech_direction=tech_direction,
+        rate_limiter=rate_limiter, transport=transport, model=model,
+    )
+
+
+class BackendRouter:
+    """
+    与 DeepSeekClient 接口一致（call / stream / last_call_stats / telemetry），额外接受 task 参数
+    （题型名或 "summary"）：
+    - TASK_ROUTES 中列出的任务只在指定后端之间分配，未列出的任务可使用全部后端；
+    - 候选后端按 (在途请求数 + 1) × 单个输出 token 耗时 / (1 - 错误率) 排序，耗时与错误率为指数滑动平均，
+      尚无数据的后端按已知最快的速度估计，保证会被试探；熔断中的后端暂不参与分配；
+    - 请求在一个后端上失败（重试耗尽）且尚未产出任何内容时，依次换下一个候选后端；
+      回放模式下某个后端的缓存未命中时同样换下一个后端查找。
+    """
+
+    def __init__(self, backends, routes=None, alpha=0.3):
+        self.backends = backends
+        self.routes = routes or {}
+        self.alpha = alpha
+        self.telemetry = next(iter(backends.values())).telemetry
+        self._stats = {name: {"seconds_per_token": None, "error_rate": 0.0, "inflight": 0} for name in backends}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _score(self, name, fallback_speed):
+        stats = self._stats[name]
+        speed = stats["seconds_per_token"] if stats["seconds_per_token"] is not None else fallback_speed
+        return (stats["inflight"] + 1) * speed / max(1.0 - stats["error_rate"], 0.05)
+
+    def candidates(self, task=None):
+        """返回该任务的候选后端名，按当前估计的完成速度从快到慢排列。"""
+        names = [name for name in self.routes.get(task, ()) if name in self.backends] or list(self.backends)
+        available = [name for name in names
+                     if self.backends[name].transport.breaker.state != CircuitBreaker.OPEN] or names
+        with self._lock:
+            known = [s["seconds_per_token"] for s in self._stats.values() if s["seconds_per_token"] is not None]
+            fallback_speed = min(known) if known else 1.0
+            return sorted(available, key=lambda name: self._score(name, fallback_speed))
+
+    def _begin(self, name):
+        with self._lock:
+            self._stats[name]["inflight"] += 1
+
+    def _finish(self, name, outcome, call_stats):
+        with self._lock:
+            stats = self._stats[name]
+            stats["inflight"] -= 1
+            if outcome in ("cache_hit", None):
+                return  # 命中本地缓存或回放未命中，均未实际发出请求
+            failed = 1.0 if outcome != "ok" else 0.0
+            stats["error_rate"] += self.alpha * (failed - stats["error_rate"])
+            if call_stats and call_stats.get("completion_tokens"):
+                observed = call_stats["latency"] / call_stats["completion_tokens"]
+                previous = stats["seconds_per_token"]
+                stats["seconds_per_token"] = (
+                    observed if previous is None else previous + self.alpha * (observed - previous)
+                )
+
+    def last_call_stats(self):
+        """返回当前线程最近一次完成请求的后端统计，含义同 DeepSeekClient.last_call_stats。"""
+        return getattr(self._local, "last_call", None)
+
+    def last_backend(self):
+        return getattr(self._local, "backend", None)
+
+    def call(self, prompt, task=None, temperature=0.3, system=None, cache_id=None):
+        self._local.last_call = None
+        names = self.candidates(task)
+        for position, name in enumerate(names):
+            client = self.backends[name]
+            self._begin(name)
+            try:
+                result = client.call(prompt, temperature=temperature, system=system, cache_id=cache_id)
+            except CacheMissError:
+                # 回放时本次的后端排序可能与记录时不同，依次查找其余后端的缓存，都未命中才报错
+                if position + 1 == len(names):
+                    raise
+                continue
+            finally:
+                self._finish(name, client.last_outcome(), client.last_call_stats())
+            if result is not None:
+                self._local.last_call = client.last_call_stats()
+                self._local.backend = name
+                return result
+            if position + 1 < len(names):
+                print(f"后端 {name} 请求失败，改用后端 {names[position + 1]}")
+        return None
+
+    def stream(self, prompt, task=None, temperature=0.3, system=None, cache_id=None):
+        self._local.last_call = None
+        names = self.candidates(task)
+        for position, name in enumerate(names):
+            client = self.backends[name]
+            produced = False
+            self._begin(name)
+            try:
+                for delta in client.stream(prompt, temperature=temperature, system=system, cache_id=cache_id):
+                    produced = True
+                    yield delta
+            except CacheMissError:
+                if position + 1 == len(names):
+                    raise
+                continue
+            finally:
+                self._finish(name, client.last_outcome(), client.last_call_stats())
+            # 已产出内容后中途出错不再切换后端，已产出的题目由调用方保留
+            if produced or client.last_outcome() != "error":
+                self._local.last_call = client.last_call_stats()
+                self._local.backend = name
+                return
+            if position + 1 < len(names):
+                print(f"后端 {name} 请求失败，改用后端 {names[position + 1]}")
+
+    def summary(self):
+        with self._lock:
+            parts = []
+            for name, stats in self._stats.items():
+                speed = stats["seconds_per_token"]
+                speed_text = f"{1 / speed:.0f} tokens/秒" if speed else "暂无数据"
+                parts.append(f"{name}（{self.backends[name].model}）：{speed_text}，错误率{stats['error_rate']:.0%}")
+        return "后端统计：" + "；".join(parts)
+
+
+def create_router(tech_direction, backends=None, routes=None):
+    """按 conf.config 中的 BACKENDS 与 TASK_ROUTES 创建路由器。"""
+    specs = backends or BACKENDS
+    clients = {name: create_backend(name, spec, tech_direction) for name, spec in specs.items()}
+    return BackendRouter(clients, TASK_ROUTES if routes is None else routes)
@@ -1,12 +1,17 @@
+import argparse
+
+from conf.config import DEFAULT_QUESTION_TYPES
 from exam_generator import EnhancedInterviewGenerator
 
 if __name__ == "__main__":
-    tech_direction = input("请输入考试技术方向（默认JAVA）：") or "JAVA"
-    generator = EnhancedInterviewGenerator(tech_direction=tech_direction)
-    generator.generate_exam_paper([
-        ("单选题", 30),
-        ("多选题", 30),
-        ("填空题", 10),
-        ("判断题", 10),
-        ("问答题", 10)
-    ])
+    parser = argparse.ArgumentParser(description="自动生成面试试卷")
+    parser.add_argument("--resume", action="store_true", help="从上次中断的检查点继续生成")
+    parser.add_argument("--manifest", help="批量组卷清单（JSON），指定后不再交互输入技术方向")
+    args = parser.parse_args()
+    if args.manifest:
+        from batch_runner import run_manifest
+        run_manifest(args.manifest, resume=args.resume)
+    else:
+        tech_direction = input("请输入考试技术方向（默认JAVA）：") or "JAVA"
+        generator = EnhancedInterviewGenerator(tech_direction=tech_direction)
+        generator.generate_exam_paper(DEFAULT_QUESTION_TYPES, resume=args.resume)
@@ -0,0 +1,78 @@
+# 提示词模板：系统角色、格式说明与示例组成逐字节固定的共享前缀放在最前，题数、技术方向、知识点列表等可变部分放在末尾，
+# 以命中服务端的上下文（前缀）缓存；模板不带缩进，并提供发送前的 token 估算
+import re
+
+# 所有任务、所有技术方向共用的系统提示词，技术方向放在用户消息末尾，不能写进这里
+SYSTEM_PROMPT = "你是资深技术面试官，负责编写高级开发工程师面试题及其知识点讲解。"
+
+_QUESTION_RULES = """请按以下要求生成面试题：
+1. 所有问题、选项和解析必须使用中文（专有名称和术语除外）。
+2. 使用严格的JSON格式，仅返回JSON，不包含任何其他文本或Markdown代码块。
+3. keywords 列出题目考查的1-3个具体知识点（如 volatile、MVCC），不要填写技术方向本身。
+4. 请确保生成的题目各不相同。
+"""
+
+_TYPE_RULES = {
+    "单选题": ("每个问题必须包含四个中文选项，用大写字母A. B. C. D. 标记，答案只能有一个正确选项。",
+              "Java中的final关键字作用？\\nA. 继承\\nB. 重写\\nC. 常量\\nD. 多态"),
+    "多选题": ("每个问题必须包含5-7个中文选项，用大写字母A. B. C. D. E. F...标记，答案应有2-7个正确选项。"
+              "问题内容必须明确列出所有选项，每个选项用大写字母开头（例如：A. 选项内容）。答案字母按升序排列（如ABE）。",
+              "哪些是Java集合接口？\\nA. List\\nB. Set\\nC. Map\\nD. Array\\nE. Queue"),
+    "填空题": ("问题中用___________表示空白，答案填具体内容。",
+              "Java中用于保证变量可见性的关键字是___________。"),
+    "判断题": ("答案只能是'正确'或'错误'。",
+              "Java中String对象是不可变的。"),
+    "问答题": ("问题必须是不含任何选项的开放式技术问题，答案为简明扼要的文字描述。",
+              "请详细解释C#中垃圾回收机制及其优化方法"),
+}
+
+_QUESTION_FORMAT = (
+    '格式：{{"questions":[{{"question":"{example}","short_answer":"最简答案",'
+    '"detailed_analysis":"300字技术解析","keywords":["知识点"],"difficulty":"1-5"}}]}}\n'
+)
+
+# 题型 -> 该题型的共享前缀；同一题型的所有请求（不分技术方向与题数）前缀完全相同
+QUESTION_PREFIXES = {
+    q_type: f"{_QUESTION_RULES}题型要求：{rule}\n" + _QUESTION_FORMAT.format(example=example)
+    for q_type, (rule, example) in _TYPE_RULES.items()
+}
+
+SUMMARY_PREFIX = """请为面试题目涉及的每个知识点分别撰写总结，要求：
+1. 每个知识点的说明应包括：详细原理和运行机制（要求内容非常详细）、实际应用场景及具体示例、使用时的注意事项和防范措施。
+2. 按知识点编号顺序逐个输出，并按照如下模板输出，每个知识点的说明后请单独输出一行‘====’作为分隔符：
+【知识点名称】：
+【原理】：
+【实际应用】：
+【注意事项】：
+3. 请确保所有知识点均被覆盖，并输出为纯文本格式，避免使用 Markdown 语法。
+"""
+
+
+def question_prompt(question_type, num, tech_direction):
+    """生成一批题目的提示词：题型前缀在前，技术方向与题数在末尾。"""
+    return (f"{QUESTION_PREFIXES[question_type]}"
+            f"技术方向：{tech_direction}\n请生成{num}道{tech_direction}高级开发工程师面试{question_type}。")
+
+
+def summary_entry(index, name, samples):
+    """知识点列表中的一项：编号、名称，以及涉及它的代表性题目。"""
+    return f"{index}. {name}\n" + "".join(f"- {' '.join(sample.split())}\n" for sample in samples)
+
+
+def summary_prompt(tech_direction, entries):
+    """知识点总结的提示词，entries 为 summary_entry 生成的文本列表。"""
+    return (f"{SUMMARY_PREFIX}技术方向：{tech_direction}\n"
+            "知识点如下（每个知识点下列出涉及它的代表性题目，供确定讲解范围）：\n" + "".join(entries))
+
+
+_CJK = re.compile(r'[⺀-鿿가-힯豈-﫿＀-￯]')
+_NON_SPACE = re.compile(r'\S')
+
+
+def estimate_tokens(text):
+    """
+    发送前估算 token 数，不依赖分词器：按 DeepSeek 文档的经验值，
+    中日韩字符与全角符号约 0.6 token/字，其余非空白字符约 0.3 token/字。
+    """
+    cjk = len(_CJK.findall(text))
+    return int(cjk * 0.6 + (len(_NON_SPACE.findall(text)) - cjk) * 0.3) + 1
@@ -0,0 +1,183 @@
+# 本地题库：持久化保存所有通过校验的题目，组卷时优先从题库抽题，API 只用于补足缺口
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tech_direction TEXT NOT NULL,
+    type TEXT NOT NULL,
+    question TEXT NOT NULL,
+    question_hash TEXT NOT NULL,
+    short_answer TEXT NOT NULL DEFAULT '',
+    detailed_analysis TEXT NOT NULL DEFAULT '',
+    keywords TEXT NOT NULL DEFAULT '[]',
+    difficulty INTEGER NOT NULL DEFAULT 3,
+    use_count INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_hash
+    ON questions (tech_direction, type, question_hash);
+CREATE INDEX IF NOT EXISTS idx_questions_select
+    ON questions (tech_direction, type, difficulty, use_count);
+CREATE TABLE IF NOT EXISTS papers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tech_direction TEXT NOT NULL,
+    filename TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_papers_direction ON papers (tech_direction, id);
+CREATE TABLE IF NOT EXISTS paper_questions (
+    paper_id INTEGER NOT NULL REFERENCES papers (id),
+    question_id INTEGER NOT NULL REFERENCES questions (id),
+    PRIMARY KEY (paper_id, question_id)
+);
+CREATE INDEX IF NOT EXISTS idx_paper_questions_question ON paper_questions (question_id);
+"""
+
+
+def _question_hash(text):
+    normalized = re.sub(r'\s+', '', text or '')
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _parse_difficulty(value):
+    """模型返回的难度可能是 3、"3" 或 "1-5" 之类的文本，统一取第一个 1-5 的数字，缺省为 3。"""
+    match = re.search(r'[1-5]', str(value))
+    return int(match.group()) if match else 3
+
+
+class QuestionBank:
+    """
+    基于 SQLite 的题库。题目按 (技术方向, 题型, 题干哈希) 唯一，
+    papers / paper_questions 记录每份试卷用过哪些题，用于“最近 N 份试卷未使用过”的筛选。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add_questions(self, tech_direction, question_type, questions):
+        """
+        保存一批已通过校验的题目，题库中已存在的题目不会重复插入。
+        会在每个题目字典上写入 bank_id，便于组卷后记录使用情况。
+        """
+        now = time.time()
+        with self._lock:
+            for q in questions:
+                q_hash = _question_hash(q.get("question", ""))
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO questions (tech_direction, type, question, question_hash, "
+                    "short_answer, detailed_analysis, keywords, difficulty, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        tech_direction, question_type, q.get("question", ""), q_hash,
+                        q.get("short_answer", ""), q.get("detailed_analysis", ""),
+                        json.dumps(q.get("keywords", []), ensure_ascii=False),
+                        _parse_difficulty(q.get("difficulty", 3)), now,
+                    ),
+                )
+                row = self._conn.execute(
+                    "SELECT id FROM questions WHERE tech_direction = ? AND type = ? AND question_hash = ?",
+                    (tech_direction, question_type, q_hash),
+                ).fetchone()
+                q["bank_id"] = row["id"]
+            self._conn.commit()
+
+    def select_questions(self, tech_direction, question_type, count, exclude_recent_papers=0):
+        """
+        从题库中抽取最多 count 道题，难度在 1-5 之间尽量均衡；
+        优先抽取使用次数少的题，并排除该方向最近 exclude_recent_papers 份试卷中用过的题。
+        返回与 API 生成结果相同结构的题目字典（额外带有 bank_id）。
+        """
+        if count <= 0:
+            return []
+        with self._lock:
+            params = [tech_direction, question_type]
+            exclude_sql = ""
+            if exclude_recent_papers:
+                exclude_sql = (
+                    "AND id NOT IN (SELECT question_id FROM paper_questions WHERE paper_id IN "
+                    "(SELECT id FROM papers WHERE tech_direction = ? ORDER BY id DESC LIMIT ?))"
+                )
+                params += [tech_direction, exclude_recent_papers]
+            by_difficulty = {}
+            for difficulty in range(1, 6):
+                rows = self._conn.execute(
+                    "SELECT * FROM questions WHERE tech_direction = ? AND type = ? AND difficulty = ? "
+                    f"{exclude_sql} ORDER BY use_count, RANDOM() LIMIT ?",
+                    [params[0], params[1], difficulty] + params[2:] + [count],
+                ).fetchall()
+                if rows:
+                    by_difficulty[difficulty] = rows
+        # 各难度轮流取题，直到凑够数量或题库耗尽
+        selected = []
+        while len(selected) < count and any(by_difficulty.values()):
+            for difficulty in sorted(by_difficulty):
+                if by_difficulty[difficulty] and len(selected) < count:
+                    selected.append(by_difficulty[difficulty].pop(0))
+        return [self._row_to_question(row) for row in selected]
+
+    @staticmethod
+    def _row_to_question(row):
+        return {
+            "question": row["question"],
+            "short_answer": row["short_answer"],
+            "detailed_analysis": row["detailed_analysis"],
+            "keywords": json.loads(row["keywords"]),
+            "difficulty": str(row["difficulty"]),
+            "bank_id": row["id"],
+        }
+
+    def record_paper(self, tech_direction, question_ids, filename=None):
+        """记录一份试卷使用的题目，并累加这些题目的使用次数，返回试卷 id。"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO papers (tech_direction, filename, created_at) VALUES (?, ?, ?)",
+                (tech_direction, filename, time.time()),
+            )
+            paper_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO paper_questions (paper_id, question_id) VALUES (?, ?)",
+                [(paper_id, qid) for qid in question_ids],
+            )
+            self._conn.executemany(
+                "UPDATE questions SET use_count = use_count + 1 WHERE id = ?",
+                [(qid,) for qid in question_ids],
+            )
+            self._conn.commit()
+        return paper_id
+
+    def question_texts(self, tech_direction):
+        """返回该方向题库中所有题目的 (id, 题干)，用于构建跨试卷的近似去重索引。"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, question FROM questions WHERE tech_direction = ?", (tech_direction,)
+            ).fetchall()
+        return [(row["id"], row["question"]) for row in rows]
+
+    def count(self, tech_direction, question_type=None):
+        with self._lock:
+            if question_type is None:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM questions WHERE tech_direction = ?", (tech_direction,)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM questions WHERE tech_direction = ? AND type = ?",
+                    (tech_direction, question_type),
+                ).fetchone()
+        return row[0]
@@ -0,0 +1,72 @@
+# 已编号题目的紧凑记录：__slots__ 对象，每道题只存一份，题型、关键词、难度等高度重复的短字符串经 sys.intern 驻留
+import re
+import sys
+
+_KEYWORD_SEPARATOR = re.compile(r'[,，、]')
+
+
+def normalize_keywords(value):
+    """
+    把模型返回的 keywords 规范为字符串列表：单个字符串（如 "volatile" 或 "MVCC、锁"）按 ,，、 拆分，
+    列表中的非字符串项与空白项丢弃，其他类型视为没有关键词。
+    """
+    if isinstance(value, str):
+        value = _KEYWORD_SEPARATOR.split(value)
+    elif not isinstance(value, (list, tuple)):
+        return []
+    return [k.strip() for k in value if isinstance(k, str) and k.strip()]
+
+
+class Question:
+    """
+    生成器为每道采纳的题目创建一个 Question，generated_questions 的各题型列表与 answer_sheet
+    引用的是同一批对象，不再复制字典；answer / analysis 只是 short_answer / detailed_analysis 的别名。
+    题型、关键词与难度在整份试卷中只有少量取值，驻留后所有题目共享同一个字符串对象。
+    对象可被 pickle，批量组卷时直接传给渲染进程。
+    """
+
+    __slots__ = ("number", "type", "question", "short_answer", "detailed_analysis",
+                 "keywords", "difficulty", "bank_id", "concept")
+
+    def __init__(self, number, q_type, question, short_answer="", detailed_analysis="",
+                 keywords=(), difficulty="", bank_id=None, concept=None):
+        self.number = number
+        self.type = sys.intern(q_type)
+        self.question = question
+        self.short_answer = short_answer
+        self.detailed_analysis = detailed_analysis
+        self.keywords = tuple(sys.intern(k) for k in normalize_keywords(keywords))
+        self.difficulty = sys.intern(str(difficulty))
+        self.bank_id = bank_id
+        self.concept = concept
+
+    @classmethod
+    def from_dict(cls, number, q_type, data):
+        """由校验通过的题目字典（API 响应、题库或检查点）创建。"""
+        return cls(
+            number, q_type, data.get("question", ""), data.get("short_answer", ""),
+            data.get("detailed_analysis", ""), data.get("keywords") or (), data.get("difficulty", ""),
+            data.get("bank_id"),
+        )
+
+    @property
+    def answer(self):
+        return self.short_answer
+
+    @property
+    def analysis(self):
+        return self.detailed_analysis
+
+    def renumbered(self, number):
+        """返回题号为 number 的浅拷贝，文本字段与原对象共享。"""
+        clone = Question.__new__(Question)
+        for name in Question.__slots__:
+            setattr(clone, name, getattr(self, name))
+        clone.number = number
+        return clone
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in Question.__slots__}
+
+    def __repr__(self):
+        return f"Question({self.number}, {self.type!r}, {self.question[:20]!r})"
@@ -0,0 +1,253 @@
+# 题目校验与修复：按题型注册校验规则，剔除前先做确定性的格式修复，并统计各规则的修复/剔除次数
+import re
+import threading
+from collections import Counter
+
+from question_model import normalize_keywords
+
+# 预编译的正则
+# 选项字母前不能紧跟字母或数字，紧跟在“？”等中文标点或汉字之后的选项同样计入
+_OPTION = re.compile(r'(?<![A-Za-z0-9])[A-Z]\.\s')
+# “A、”“A．”“A:”“A)”“A.选项” 等写法（包括 “作用？A、继承 B、重写” 这类同一行内的选项），统一规范为 “A. ”；
+# 标记只能出现在行首、空白或中文标点之后；半角的 “.” “:” “)” 后面还须紧跟空白或非 ASCII 字符，
+# “A.foo()” 之类的代码不会被改写
+_LOOSE_OPTION_MARKER = re.compile(
+    r'(?:^|(?<=[\s，。；：？！、）]))([A-H])[ \t]*(?:[、．：）][ \t]*|[.:)](?:[ \t]+|(?=[^\x00-\x7f])))',
+    re.MULTILINE,
+)
+# 多选题答案：升序排列、互不重复的 2 个以上选项字母
+_OPTION_LETTERS = re.compile(r'^[A-H]+$')
+# 只由选项字母与分隔符组成的答案才做字母规范化，“B. Cache” 之类带选项内容的答案留给校验规则剔除
+_LETTERS_ONLY_ANSWER = re.compile(r'^[A-Ha-h\s,，、.。;；和]+$')
+_LETTER_RUN = re.compile(r'[A-Za-z]+')
+_NON_LETTER = re.compile(r'[^A-Za-z]')
+_JUDGE_TRUE = re.compile(r'^(正确|对|是|√|✓|true|yes|t)$', re.IGNORECASE)
+_JUDGE_FALSE = re.compile(r'^(错误|错|否|×|✗|false|no|f)$', re.IGNORECASE)
+_TRAILING_PUNCT = re.compile(r'[\s。．.，,;；!！]+$')
+_ANSWER_PREFIX = re.compile(r'^(答案|正确答案|answer)\s*[:：]\s*', re.IGNORECASE)
+
+# 题型 -> [(规则名, 函数)]；修复函数原地修改题目并返回是否做了修改，
+# 校验函数返回 None 表示通过，否则返回剔除原因
+_REPAIRS = {}
+_CHECKS = {}
+ALL_TYPES = "*"
+
+
+def repair(*question_types):
+    def decorator(func):
+        for q_type in question_types or (ALL_TYPES,):
+            _REPAIRS.setdefault(q_type, []).append((func.__name__, func))
+        return func
+    return decorator
+
+
+def check(*question_types):
+    def decorator(func):
+        for q_type in question_types or (ALL_TYPES,):
+            _CHECKS.setdefault(q_type, []).append((func.__name__, func))
+        return func
+    return decorator
+
+
+def _rules(registry, question_type):
+    return registry.get(ALL_TYPES, []) + registry.get(question_type, [])
+
+
+# ---------- 修复规则 ----------
+
+@repair()
+def strip_fields(q):
+    changed = False
+    for field in ("question", "short_answer"):
+        value = q.get(field)
+        if isinstance(value, str) and value != value.strip():
+            q[field] = value.strip()
+            changed = True
+    return changed
+
+
+@repair()
+def normalize_keyword_list(q):
+    # 字符串形式的 keywords 不能按字符遍历，入库、写检查点与归类前统一为字符串列表
+    if "keywords" not in q:
+        return False
+    keywords = normalize_keywords(q["keywords"])
+    if keywords != q["keywords"]:
+        q["keywords"] = keywords
+        return True
+    return False
+
+
+@repair()
+def strip_answer_prefix(q):
+    answer = q.get("short_answer")
+    if isinstance(answer, str) and _ANSWER_PREFIX.match(answer):
+        q["short_answer"] = _ANSWER_PREFIX.sub("", answer).strip()
+        return True
+    return False
+
+
+def _normalize_option_markers(q, expected_counts):
+    # 只有改写后的选项数符合题型要求时才采用，避免把题干中的其他内容误当作选项
+    question = q.get("question")
+    if not isinstance(question, str):
+        return False
+    fixed = _LOOSE_OPTION_MARKER.sub(lambda m: f"{m.group(1)}. ", question)
+    if fixed != question and len(_OPTION.findall(fixed)) in expected_counts:
+        q["question"] = fixed
+        return True
+    return False
+
+
+@repair("单选题")
+def normalize_single_option_markers(q):
+    return _normalize_option_markers(q, (4,))
+
+
+@repair("多选题")
+def normalize_multi_option_markers(q):
+    return _normalize_option_markers(q, (5, 6, 7))
+
+
+@repair("单选题", "多选题")
+def normalize_answer_letters(q):
+    """去掉答案中的空白、逗号、句号等分隔符并转为大写，例如 ' b。' -> 'B'、'A, C' -> 'AC'。"""
+    answer = q.get("short_answer")
+    if not isinstance(answer, str) or not _LETTERS_ONLY_ANSWER.match(answer):
+        return False
+    # 连续多个字母只接受全大写（如 “ABE”），小写或大小写混合的连写（如 “Cache”）是单词而不是选项
+    if any(len(run) > 1 and not run.isupper() for run in _LETTER_RUN.findall(answer)):
+        return False
+    letters = _NON_LETTER.sub("", answer).upper()
+    if len(set(letters)) != len(letters):
+        return False
+    if letters and letters != answer and all("A" <= ch <= "H" for ch in letters):
+        q["short_answer"] = letters
+        return True
+    return False
+
+
+@repair("多选题")
+def sort_answer_letters(q):
+    # 只给由互不重复的选项字母组成的答案排序，“Cache”“AAB” 之类的答案留给校验规则剔除
+    answer = q.get("short_answer", "")
+    if isinstance(answer, str) and _OPTION_LETTERS.match(answer) and len(set(answer)) == len(answer):
+        fixed = "".join(sorted(answer))
+        if fixed != answer:
+            q["short_answer"] = fixed
+            return True
+    return False
+
+
+@repair("判断题")
+def normalize_judgement(q):
+    answer = q.get("short_answer")
+    if not isinstance(answer, str):
+        return False
+    bare = _TRAILING_PUNCT.sub("", answer)
+    if _JUDGE_TRUE.match(bare):
+        fixed = "正确"
+    elif _JUDGE_FALSE.match(bare):
+        fixed = "错误"
+    else:
+        return False
+    if fixed != answer:
+        q["short_answer"] = fixed
+        return True
+    return False
+
+
+# ---------- 校验规则 ----------
+
+@check()
+def question_present(q):
+    if not isinstance(q.get("question"), str) or not q["question"]:
+        return f"缺少题干: {q}"
+    return None
+
+
+@check("单选题")
+def single_answer_format(q):
+    answer = q.get("short_answer", "")
+    if not isinstance(answer, str) or len(answer) != 1 or not answer.isalpha():
+        return f"单选题答案格式错误: {answer}"
+    return None
+
+
+@check("单选题")
+def single_option_count(q):
+    if len(_OPTION.findall(q["question"])) != 4:
+        return f"单选题选项数量不为4: {q['question']}"
+    return None
+
+
+@check("多选题")
+def multi_answer_format(q):
+    answer = q.get("short_answer", "")
+    if (not isinstance(answer, str) or len(answer) < 2 or not _OPTION_LETTERS.match(answer)
+            or answer != ''.join(sorted(set(answer)))):
+        return f"多选题答案格式错误: {answer}"
+    return None
+
+
+@check("多选题")
+def multi_options_present(q):
+    if not _OPTION.search(q["question"]):
+        return f"多选题选项缺失: {q['question']}"
+    return None
+
+
+@check("判断题")
+def judgement_answer(q):
+    if q.get("short_answer") not in ("正确", "错误"):
+        return f"判断题答案不是'正确'或'错误': {q.get('short_answer')}"
+    return None
+
+
+@check("问答题")
+def essay_has_no_options(q):
+    if _OPTION.search(q["question"]):
+        return f"问答题包含选项: {q['question']}"
+    return None
+
+
+class QuestionValidator:
+    """
+    对单道题目先依次执行该题型注册的修复规则，再执行校验规则，任一校验失败即剔除。
+    repaired / rejected 按规则名累计修复与剔除次数，可在多个工作线程间共享。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.repaired = Counter()
+        self.rejected = Counter()
+
+    def validate(self, question_type, q):
+        """修复并校验题目（原地修改），返回是否保留；不是 JSON 对象的条目直接剔除。"""
+        if not isinstance(q, dict):
+            print(f"题目不是 JSON 对象: {q}，已剔除该题")
+            with self._lock:
+                self.rejected["not_an_object"] += 1
+            return False
+        repaired = []
+        for name, func in _rules(_REPAIRS, question_type):
+            if func(q):
+                repaired.append(name)
+        for name, func in _rules(_CHECKS, question_type):
+            reason = func(q)
+            if reason is not None:
+                print(f"{reason}，已剔除该题")
+                with self._lock:
+                    self.rejected[name] += 1
+                return False
+        with self._lock:
+            self.accepted += 1
+            self.repaired.update(repaired)
+        return True
+
+    def summary(self):
+        repaired = "、".join(f"{name}×{count}" for name, count in self.repaired.most_common()) or "无"
+        rejected = "、".join(f"{name}×{count}" for name, count in self.rejected.most_common()) or "无"
+        return (f"校验统计：通过{self.accepted}题，修复{sum(self.repaired.values())}处（{repaired}），"
+                f"剔除{sum(self.rejected.values())}题（{rejected}）")
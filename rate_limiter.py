@@ -0,0 +1,54 @@
+# 全局请求限流：限制同时在途的请求数量与每分钟请求数
+import threading
+import time
+from collections import deque
+
+
+class RateLimiter:
+    """
+    同时限制并发数与每分钟请求数（RPM）的限流器，线程安全。
+    用法：
+        with limiter:
+            client.chat.completions.create(...)
+    """
+
+    def __init__(self, max_concurrent=8, requests_per_minute=60):
+        self.max_concurrent = max_concurrent
+        self.requests_per_minute = requests_per_minute
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        # 记录最近 60 秒内发出请求的时间戳（滑动窗口）
+        self._timestamps = deque()
+
+    def _wait_for_slot(self):
+        if not self.requests_per_minute:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._timestamps and now - self._timestamps[0] >= 60:
+                    self._timestamps.popleft()
+                if len(self._timestamps) < self.requests_per_minute:
+                    self._timestamps.append(now)
+                    return
+                wait = 60 - (now - self._timestamps[0])
+            time.sleep(max(wait, 0.01))
+
+    def acquire(self):
+        self._semaphore.acquire()
+        try:
+            self._wait_for_slot()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    def release(self):
+        self._semaphore.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
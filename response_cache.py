@@ -0,0 +1,113 @@
+# API 响应的本地磁盘缓存：按请求内容哈希寻址，支持按容量/时间的 LRU 淘汰与离线回放
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class CacheMissError(RuntimeError):
+    """回放模式下请求未命中缓存时抛出，避免静默地访问网络。"""
+
+
+class ResponseCache:
+    """
+    以 sha256(model, temperature, system, prompt) 为键，把响应文本保存为 cache_dir 下的独立 JSON 文件。
+    - 写入先落到同目录临时文件再 os.replace，多线程/多进程同时写同一键也不会读到半截内容；
+    - 读取命中时刷新文件 mtime，淘汰时按 mtime 从旧到新删除，即 LRU；
+    - 超过 max_age_seconds 的条目视为过期，读取时当作未命中并在淘汰时删除。
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, max_age_seconds=30 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model, temperature, system, prompt):
+        payload = json.dumps([model, temperature, system, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        # 按哈希前两位分目录，避免单目录文件过多
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if self.max_age_seconds and time.time() - entry.get("created_at", 0) > self.max_age_seconds:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry.get("content")
+
+    def put(self, key, content, **meta):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = dict(meta, content=content, created_at=time.time())
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        with self._lock:
+            self._writes_since_evict += 1
+            should_evict = self._writes_since_evict >= 50
+            if should_evict:
+                self._writes_since_evict = 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """删除过期条目，再按最近访问时间从旧到新删除，直到总大小不超过 max_bytes。"""
+        now = time.time()
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                # 残留超过一小时的临时文件来自中断的写入，直接清理
+                expired = name.endswith(".tmp") and now - st.st_mtime > 3600
+                if not expired and self.max_age_seconds:
+                    expired = now - st.st_mtime > self.max_age_seconds
+                if expired:
+                    self._remove(path)
+                    continue
+                if name.endswith(".json"):
+                    entries.append((st.st_mtime, st.st_size, path))
+                    total += st.st_size
+        if not self.max_bytes or total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
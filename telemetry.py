@@ -0,0 +1,209 @@
+# 结构化遥测：记录每次 API 调用的延迟与 token 用量、各阶段耗时，输出 JSONL 追踪文件与 Prometheus 文本快照
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from conf.config import TELEMETRY_DIR
+
+_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def usage_tokens(usage):
+    """从 SDK 的 usage 对象取出 (prompt, completion, cached) token 数，兼容 DeepSeek 与 OpenAI 的缓存字段。"""
+    if usage is None:
+        return 0, 0, 0
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    if cached is None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) if details is not None else 0
+    return prompt, completion, cached or 0
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in sorted(labels))
+    return "{" + ",".join(escaped) + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets=_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Telemetry:
+    """
+    线程安全的指标与追踪记录器。
+    - record_call：每次 API 调用写一行追踪记录，并累计调用数、延迟、首 token 延迟与 token 用量；
+    - span：粗粒度阶段（按题型生成、知识点总结、文档渲染、保存等）写一行追踪记录并计入阶段耗时；
+    - timer：高频的细粒度阶段（单题校验、去重）只累计耗时直方图，不逐条写追踪文件。
+    trace_dir 为 None 时只在内存中汇总。
+    """
+
+    def __init__(self, trace_dir=None):
+        self.trace_dir = trace_dir
+        self.run_id = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._trace_file = None
+        if trace_dir:
+            os.makedirs(trace_dir, exist_ok=True)
+            self._trace_file = open(os.path.join(trace_dir, "trace.jsonl"), "a", encoding="utf-8")
+
+    def _write(self, record):
+        if self._trace_file is None:
+            return
+        record = dict(record, run_id=self.run_id, ts=time.time())
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._trace_file.write(line + "\n")
+            self._trace_file.flush()
+
+    def _inc(self, name, labels, value=1.0):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def _observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(value)
+
+    def record_call(self, model, kind, outcome, latency=None, ttft=None, usage=None, **attrs):
+        """记录一次 API 调用；outcome 为 ok / error / cache_hit。"""
+        prompt, completion, cached = usage_tokens(usage)
+        labels = {"model": model, "kind": kind}
+        self._inc("exam_api_calls_total", dict(labels, outcome=outcome))
+        if latency is not None:
+            self._observe("exam_api_call_latency_seconds", labels, latency)
+        if ttft is not None:
+            self._observe("exam_api_time_to_first_token_seconds", labels, ttft)
+        for token_type, value in (("prompt", prompt), ("completion", completion), ("cached", cached)):
+            if value:
+                self._inc("exam_api_tokens_total", dict(labels, type=token_type), value)
+        self._write({
+            "event": "api_call", "model": model, "kind": kind, "outcome": outcome,
+            "latency": latency, "ttft": ttft, "prompt_tokens": prompt,
+            "completion_tokens": completion, "cached_tokens": cached, **attrs,
+        })
+
+    def record_span(self, stage, start, end, **attrs):
+        """记录一个已结束的阶段（start/end 为 time.monotonic() 时间）。"""
+        duration = end - start
+        self._observe("exam_stage_duration_seconds", {"stage": stage}, duration)
+        self._write({"event": "span", "stage": stage, "duration": duration, **attrs})
+
+    @contextmanager
+    def span(self, stage, **attrs):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_span(stage, start, time.monotonic(), **attrs)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._observe("exam_stage_duration_seconds", {"stage": stage}, time.monotonic() - start)
+
+    def counter_total(self, name, **labels):
+        """累加名称为 name 且标签包含 labels 的所有计数器。"""
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(value for (n, l), value in self._counters.items()
+                       if n == name and wanted <= set(l))
+
+    def stage_totals(self):
+        """返回 {阶段: (次数, 总耗时秒)}。"""
+        totals = {}
+        with self._lock:
+            for (name, labels), histogram in self._histograms.items():
+                if name == "exam_stage_duration_seconds":
+                    totals[dict(labels)["stage"]] = (histogram.count, histogram.sum)
+        return totals
+
+    def token_summary(self):
+        """输入 / 输出 token 总数，以及输入中命中服务端上下文缓存的比例。"""
+        prompt = self.counter_total("exam_api_tokens_total", type="prompt")
+        cached = self.counter_total("exam_api_tokens_total", type="cached")
+        completion = self.counter_total("exam_api_tokens_total", type="completion")
+        rate = cached / prompt if prompt else 0.0
+        return (f"输入 {prompt:.0f} tokens（命中上下文缓存 {cached:.0f}，{rate:.1%}），"
+                f"输出 {completion:.0f} tokens")
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            seen = set()
+            for (name, labels), value in counters:
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{_label_text(labels)} {value:g}")
+            for (name, labels), histogram in histograms:
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# TYPE {name} histogram")
+                # observe() 已按累计方式计数，可直接输出
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f"{name}_bucket{_label_text(labels + (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_label_text(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_label_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, path=None):
+        """写出 Prometheus 文本格式的指标快照，返回文件路径。"""
+        if path is None:
+            if not self.trace_dir:
+                return None
+            path = os.path.join(self.trace_dir, "metrics.prom")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+        return path
+
+    def close(self):
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_telemetry():
+    """进程内共享的遥测记录器，输出目录由 conf.config.TELEMETRY_DIR 决定。"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Telemetry(TELEMETRY_DIR)
+        return _default